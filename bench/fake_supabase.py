@@ -0,0 +1,289 @@
+import datetime
+import functools
+import json
+import operator
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# PostgREST filter operators used by the app, applied to JSON-like row values
+_OPS = {
+    'eq': operator.eq,
+    'neq': operator.ne,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'in': lambda value, options: value in options,
+}
+
+
+def _wire(value):
+    # PostgREST sends filter values as text: dates and timestamps travel as ISO strings
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+@functools.lru_cache(maxsize=65536)
+def _instant(text):
+    # Postgres compares date/timestamp columns as instants; a naive value is taken as UTC
+    try:
+        ts = pd.Timestamp(text)
+    except (ValueError, TypeError):
+        return None
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts
+
+
+def _matches(test, row_value, value):
+    # Same-shape strings (e.g. two YYYY-MM-DD dates) already compare correctly as text
+    if isinstance(value, str) and isinstance(row_value, str) and len(value) != len(row_value):
+        left, right = _instant(row_value), _instant(value)
+        if left is not None and right is not None:
+            return test(left, right)
+    return test(row_value, value)
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class RowTable:
+    """A table held as a list of JSON-like dicts, indexed by sym when the column exists.
+
+    ``serial`` names a bigserial-style column filled in on insert when a row lacks it.
+    """
+
+    def __init__(self, rows=None, serial=None):
+        self.rows = []
+        self.by_sym = {}
+        self.serial = serial
+        self.next_id = 1
+        self._lock = threading.Lock()
+        self.insert(rows or [])
+
+    def insert(self, rows):
+        with self._lock:
+            for row in rows:
+                if self.serial is not None and row.get(self.serial) is None:
+                    row = {**row, self.serial: self.next_id}
+                    self.next_id += 1
+                self.rows.append(row)
+                if 'sym' in row:
+                    self.by_sym.setdefault(row['sym'], []).append(row)
+        return rows
+
+    def select(self, symbols=None):
+        if symbols is None:
+            return list(self.rows)
+        return [row for sym in symbols for row in self.by_sym.get(sym, ())]
+
+
+class GeneratedTable:
+    """A per-symbol table whose rows are produced on demand, e.g. 20 years of daily bars.
+
+    Generated symbols are kept in a small LRU so repeated reads do not regenerate them,
+    while a 10k-symbol universe never has to sit in memory at once.
+    """
+
+    def __init__(self, symbols, generate, cache_size=256):
+        self.symbols = list(symbols)
+        self.known = set(self.symbols)
+        self.generate = generate
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _rows(self, sym):
+        with self._lock:
+            rows = self._cache.get(sym)
+            if rows is not None:
+                self._cache.move_to_end(sym)
+                return rows
+        rows = self.generate(sym)
+        with self._lock:
+            self._cache[sym] = rows
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    def insert(self, rows):
+        raise TypeError('generated tables are read-only')
+
+    def select(self, symbols=None):
+        symbols = self.symbols if symbols is None else [s for s in symbols if s in self.known]
+        return [row for sym in symbols for row in self._rows(sym)]
+
+
+class FakeQuery:
+    """The chainable subset of the postgrest query builder the app calls."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = None
+        self.filters = []
+        self.ordering = []
+        self.bounds = None
+        self.rows_to_insert = None
+        self.values_to_update = None
+
+    def select(self, columns='*', count=None):
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    def _filter(self, op, column, value):
+        self.filters.append((op, column, _wire(value)))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, {_wire(value) for value in values})
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def limit(self, size):
+        self.bounds = (0, size - 1)
+        return self
+
+    def insert(self, rows):
+        self.rows_to_insert = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values):
+        self.values_to_update = dict(values)
+        return self
+
+    def _symbols(self):
+        # eq/in_ on sym are answered from the table's index instead of a full scan
+        for op, column, value in self.filters:
+            if column == 'sym' and op == 'eq':
+                return [value]
+            if column == 'sym' and op == 'in':
+                return list(value)
+        return None
+
+    def execute(self):
+        self.client._round_trip()
+        table = self.client.tables.get(self.table)
+        if self.rows_to_insert is not None:
+            if table is None:
+                table = self.client.tables.setdefault(self.table, RowTable())
+            return FakeResponse(table.insert(self.rows_to_insert))
+        if table is None:
+            raise KeyError(f'unknown table {self.table!r}')
+        rows = table.select(self._symbols())
+        for op, column, value in self.filters:
+            test = _OPS[op]
+            rows = [row for row in rows if row.get(column) is not None and _matches(test, row.get(column), value)]
+        if self.values_to_update is not None:
+            # Rows are shared dicts, so updating them in place updates the table
+            for row in rows:
+                row.update(self.values_to_update)
+            return FakeResponse([dict(row) for row in rows])
+        for column, desc in reversed(self.ordering):
+            rows.sort(key=lambda row: row.get(column), reverse=desc)
+        if self.bounds is not None:
+            rows = rows[self.bounds[0]:self.bounds[1] + 1]
+        if self.columns is not None:
+            rows = [{col: row.get(col) for col in self.columns} for row in rows]
+        else:
+            rows = [dict(row) for row in rows]
+        return FakeResponse(rows)
+
+
+class FakeRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client._round_trip()
+        return FakeResponse(self.client.functions[self.name](self.params or {}))
+
+
+class FakeSupabase:
+    """In-memory stand-in for the supabase-py client: ``table()`` queries and ``rpc()`` calls.
+
+    ``latency`` adds a fixed sleep per request so pooling and fan-out behave like they
+    do against the real project; ``calls`` counts round trips.
+    """
+
+    def __init__(self, tables=None, functions=None, latency=0.0):
+        self.tables = dict(tables or {})
+        self.functions = {'match_vectors': self._match_vectors, **(functions or {})}
+        self.latency = latency
+        self.calls = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self, name, params)
+
+    def _vector_matrix(self):
+        # Built once from dim_det, mirroring what the database keeps in its vector columns
+        if self._vectors is None:
+            rows = self.tables['dim_det'].select()
+            symbols = [row['sym'] for row in rows]
+            v_ps = np.array([json.loads(row['v_ps']) for row in rows], dtype=np.float32)
+            v_rsi = np.array([json.loads(row['v_rsi']) for row in rows], dtype=np.float32)
+            v_ps /= np.linalg.norm(v_ps, axis=1, keepdims=True)
+            v_rsi /= np.linalg.norm(v_rsi, axis=1, keepdims=True)
+            self._vectors = (symbols, v_ps, v_rsi)
+        return self._vectors
+
+    def _match_vectors(self, params):
+        # Brute-force cosine similarity, the same ranking the match_vectors function returns
+        symbols, v_ps, v_rsi = self._vector_matrix()
+        q_ps = np.asarray(json.loads(params['query_v_ps']) if isinstance(params['query_v_ps'], str) else params['query_v_ps'], dtype=np.float32)
+        q_rsi = np.asarray(json.loads(params['query_v_rsi']) if isinstance(params['query_v_rsi'], str) else params['query_v_rsi'], dtype=np.float32)
+        ps = v_ps @ (q_ps / np.linalg.norm(q_ps))
+        rsi = v_rsi @ (q_rsi / np.linalg.norm(q_rsi))
+        score = (ps + rsi) / 2
+        top = np.argsort(-score, kind='stable')[:params.get('match_count', 100)]
+        return [
+            {'sym': symbols[i], 'ps_similarity': float(ps[i]), 'rsi_similarity': float(rsi[i]), 'similarity': float(score[i])}
+            for i in top
+        ]
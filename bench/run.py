@@ -0,0 +1,245 @@
+"""Per-stage benchmarks against a synthetic universe served by FakeSupabase.
+
+    python -m bench.run --symbols 10000 --years 20 --out bench/results.json
+    python -m bench.run --baseline bench/results.json   # non-zero exit on regressions
+
+Nothing here talks to the live project; every query goes through bench.fake_supabase.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Point the local fact replica at a scratch directory before the app modules read their env
+os.environ.pop('STOCKSUPERHERO_OFFLINE', None)
+os.environ.setdefault('STOCKSUPERHERO_STORE', tempfile.mkdtemp(prefix='stocksuperhero-bench-'))
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+import pandas as pd
+import plotly
+from bench.synthetic import SyntheticUniverse
+from functions.agstyler import paginate_frame
+from functions.area import build_area_chart
+from functions.bar import plot_bar_chart
+from functions.db import use_client
+from functions.detail import DimDetColumns, load_detail
+from functions.dim_cache import DimCache
+from functions.filter_index import FilterIndex
+from functions.gauge import build_gauge_grid
+from functions.indicators import compute_indicators
+from functions.macd import build_macd_chart
+from functions.metric import build_metric_chart
+from functions.peers import align_series, fetch_peer_history, normalize_series
+from functions.fact_store import get_fact_store
+from functions.rollup import DAILY_TABLE, extend_bars, rollup, tail_start
+from functions.schema import decode_trend_labels
+from functions.screener import Screener
+from functions.vector_search import VectorIndex, fetch_vectors
+
+REGRESSION_THRESHOLD = 1.25
+
+
+def measure(fn, repeat=5, warmup=1):
+    for _ in range(warmup):
+        result = fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    return result, {
+        'repeat': repeat,
+        'min_ms': float(times.min()),
+        'median_ms': float(np.median(times)),
+        'p90_ms': float(np.percentile(times, 90)),
+        'mean_ms': float(times.mean()),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(n_symbols, years, repeat, latency, symbol=None, period='fact_daily', seed=0):
+    results = {}
+
+    def stage(name, fn, repeat=repeat, warmup=1, **extra):
+        value, timing = measure(fn, repeat=repeat, warmup=warmup)
+        results[name] = {**timing, **extra}
+        print(f"{name:<28} median {timing['median_ms']:9.2f} ms   p90 {timing['p90_ms']:9.2f} ms", file=sys.stderr)
+        return value
+
+    start = time.perf_counter()
+    universe = SyntheticUniverse(n_symbols=n_symbols, years=years, seed=seed)
+    client = universe.client(latency=latency)
+    use_client(client)
+    setup_s = time.perf_counter() - start
+    symbol = symbol or universe.symbols[0]
+
+    # Screener: dim load, bitmap filter index, paged grid preparation
+    df_dim = stage('dim.full_load', lambda: DimCache(client).get(), repeat=max(1, repeat // 2), rows=n_symbols)
+    # TTL refresh: only rows whose updated_at moved past the watermark (1% here) are pulled
+    dim_cache = DimCache(client, full_refresh_every=sys.maxsize)
+    dim_cache.get()
+    touched = client.tables['dim'].rows[::100]
+
+    def incremental_refresh():
+        stamp = (dim_cache.last_watermark + pd.Timedelta(seconds=1)).isoformat()
+        for row in touched:
+            row['updated_at'] = stamp
+        dim_cache.refresh()
+        return dim_cache.version
+
+    stage('dim.incremental_refresh', incremental_refresh, rows=len(touched))
+    index = stage('filter.index_build', lambda: FilterIndex(df_dim))
+    sec = df_dim['sec'].iloc[0]
+    filtered = stage('filter.query', lambda: index.filter(sec=[sec], pst=['Cheap', 'Low']))
+    stage('filter.options', lambda: index.options('ind', sec=[sec]))
+    screener = stage('screen.build', lambda: Screener(df_dim))
+    stage('screen.query', lambda: screener.screen(base=index.mask(sec=[sec]), ranges={'ps_sec_pct': (None, 0.3), 'dy': (0.5, None)}, limit=100))
+    stage('screen.full_top', lambda: screener.screen(limit=100))
+    stage('grid.paginate', lambda: paginate_frame(df_dim, 0, 100, sort_by='ps', ascending=False))
+    stage('grid.paginate_search', lambda: paginate_frame(df_dim, 0, 100, sort_by='ps', search='A'))
+
+    # Vector search
+    vectors = stage('vector.fetch', lambda: fetch_vectors(client), repeat=max(1, repeat // 2))
+    vector_index = stage('vector.index_build', lambda: VectorIndex.from_frame(vectors), repeat=max(1, repeat // 2))
+    neighbours = stage('vector.search_symbol', lambda: vector_index.search_symbol(symbol))
+
+    # Detail: the first call pulls history into the local replica, later calls only check the watermark
+    bundle = stage('detail.load_cold', lambda: load_detail(symbol, period), repeat=1, warmup=0)
+    stage('detail.load_warm', lambda: load_detail(symbol, period))
+    df_fact, df_dim_det = bundle.fact, bundle.dim_det
+
+    # Period bars: full rollups of the daily bars, and the stored weekly table continued
+    # with a rollup of its daily tail, which is what detail and peers do
+    store = get_fact_store()
+    daily = store.bars(DAILY_TABLE, [symbol])[symbol]
+    weekly = store.bars('fact', [symbol])[symbol]
+    stage('rollup.weekly', lambda: rollup(daily, 'W-FRI'), rows=len(daily))
+    stage('rollup.monthly', lambda: rollup(daily, 'M'), rows=len(daily))
+    # A stored table five weeks behind the daily bars
+    stored = weekly.iloc[:-5]
+    tail = daily[daily['dt_st'] >= tail_start(stored)]
+    stage('rollup.extend', lambda: extend_bars(stored, tail, 'W-FRI'), rows=len(tail))
+    other = 'fact' if period != 'fact' else 'fact_monthly'
+    stage('detail.period_switch', lambda: bundle.for_period(other))
+    df_tech = stage('indicators.compute', lambda: compute_indicators(df_fact))
+    heavy = DimDetColumns(client)
+    stage('detail.heavy_cold', lambda: DimDetColumns(client).get(symbol, ['trend_json_ss', 'v_ps', 'v_rsi']))
+    stage('detail.heavy_warm', lambda: heavy.get(symbol, ['trend_json_ss']))
+    df_labels = decode_trend_labels(heavy.get(symbol, ['trend_json_ss'])['trend_json_ss'])
+
+    # Chart builders (figure construction only, without the figure cache)
+    fig_area = stage('chart.area', lambda: build_area_chart(df_fact, symbol, df_labels, 'p', 'dodgerblue'))
+    fig_area_full = stage('chart.area_full', lambda: build_area_chart(df_fact, symbol, df_labels, 'p', 'dodgerblue', downsample=None))
+    month_fact = df_fact.assign(dt_st=df_fact['dt_st'].dt.strftime('%b %y').astype(str))
+    month_labels = df_labels.assign(dt_st=df_labels['dt_st'].dt.strftime('%b %y').astype(str))
+    stage('chart.metric', lambda: build_metric_chart(month_fact, symbol, month_labels, 'ps', 'hotpink'))
+    stage('chart.macd', lambda: build_macd_chart(df_tech))
+    stage('chart.gauges', lambda: build_gauge_grid(df_dim_det))
+    stage('chart.bar', lambda: plot_bar_chart(filtered, symbol), rows=len(filtered))
+    peers = [symbol] + neighbours['sym'].head(12).tolist()
+    df_peers = stage('peers.fetch', lambda: fetch_peer_history(peers, period), repeat=max(1, repeat // 2))
+    stage('peers.align', lambda: normalize_series(align_series(df_peers)))
+    stage('figure.to_json', lambda: fig_area.to_json(), bytes=len(fig_area.to_json()), bytes_full=len(fig_area_full.to_json()))
+
+    # Render backends: the same full-resolution builds as SVG and as WebGL traces
+    for backend in ('svg', 'webgl'):
+        for name, build in (
+            ('area_full', lambda: build_area_chart(df_fact, symbol, df_labels, 'p', 'dodgerblue', downsample=None, backend=backend)),
+            ('metric_full', lambda: build_metric_chart(month_fact, symbol, month_labels, 'ps', 'hotpink', downsample=None, backend=backend)),
+            ('macd', lambda: build_macd_chart(df_tech, backend=backend)),
+        ):
+            fig = build()
+            stage(f'backend.{backend}.{name}', lambda: build().to_json(), bytes=len(fig.to_json()), points=len(fig.data[0].x))
+
+    # What the app draws: default downsampling, backend picked per trace from the points drawn
+    for name, build in (
+        ('area', lambda: build_area_chart(df_fact, symbol, df_labels, 'p', 'dodgerblue', backend='auto')),
+        ('metric', lambda: build_metric_chart(month_fact, symbol, month_labels, 'ps', 'hotpink', backend='auto')),
+        ('macd', lambda: build_macd_chart(df_tech, backend='auto')),
+    ):
+        fig = build()
+        stage(f'backend.auto.{name}', lambda: build().to_json(), bytes=len(fig.to_json()), points=len(fig.data[0].x),
+              trace=fig.data[0].type)
+
+    return {
+        'meta': {
+            'symbols': n_symbols,
+            'years': years,
+            'fact_rows': len(df_fact),
+            'period': period,
+            'latency_ms': latency * 1000,
+            'setup_s': setup_s,
+            'round_trips': client.calls,
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plotly': plotly.__version__,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    # Stages whose median grew by more than threshold against the baseline run
+    regressions = {}
+    for key in ('symbols', 'years', 'period'):
+        if baseline.get('meta', {}).get(key) != report['meta'][key]:
+            print(f"warning: baseline {key} differs ({baseline.get('meta', {}).get(key)} vs {report['meta'][key]})", file=sys.stderr)
+    for name, row in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before and before['median_ms'] > 0:
+            ratio = row['median_ms'] / before['median_ms']
+            row['vs_baseline'] = round(ratio, 3)
+            if ratio > threshold:
+                regressions[name] = ratio
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated seconds per round trip')
+    parser.add_argument('--period', default='fact_daily', choices=['fact_daily', 'fact', 'fact_monthly'])
+    parser.add_argument('--symbol')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the JSON report here (default: stdout)')
+    parser.add_argument('--baseline', help='earlier JSON report to compare medians against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = run(args.symbols, args.years, args.repeat, args.latency, args.symbol, args.period, args.seed)
+    regressions = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+    for name, ratio in regressions.items():
+        print(f"regression: {name} is {ratio:.2f}x the baseline median", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
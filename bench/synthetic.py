@@ -0,0 +1,179 @@
+import json
+import zlib
+import numpy as np
+import pandas as pd
+from bench.fake_supabase import FakeSupabase, GeneratedTable, RowTable
+from functions.indicators import compute_indicators
+
+SECTORS = {
+    'Technology': ['Software', 'Semiconductors', 'Hardware', 'IT Services'],
+    'Consumer Cyclical': ['Restaurants', 'Retail', 'Autos', 'Leisure'],
+    'Consumer Defensive': ['Beverages', 'Packaged Foods', 'Household Products'],
+    'Healthcare': ['Biotechnology', 'Medical Devices', 'Pharmaceuticals'],
+    'Financial Services': ['Banks', 'Insurance', 'Asset Management'],
+    'Industrials': ['Aerospace', 'Machinery', 'Transportation'],
+    'Energy': ['Oil & Gas', 'Renewables'],
+    'Utilities': ['Electric Utilities', 'Water Utilities'],
+}
+EXCHANGES = ['NASDAQ', 'NYSE', 'AMEX']
+VALUATION_TYPES = ['Cheap', 'Low', 'High', 'Expensive']
+GAUGE_QUANTILES = {'min': 0.0, '2': 0.2, '5': 0.5, '8': 0.8, 'max': 1.0}
+
+
+def ticker(i):
+    # 0 -> AAAA, 1 -> AAAB, ... unique and stable for any universe size
+    letters = []
+    for _ in range(4):
+        i, r = divmod(i, 26)
+        letters.append(chr(ord('A') + r))
+    return ''.join(reversed(letters)) + (str(i) if i else '')
+
+
+def _round(values, digits=2):
+    return [None if v != v else round(float(v), digits) for v in values]
+
+
+class SyntheticUniverse:
+    """Deterministic dim, dim_det, fact and tech tables at any scale.
+
+    Per-symbol history is derived from a seed per symbol, so bars are generated lazily
+    and identically on every run; ``client()`` exposes everything through FakeSupabase.
+    """
+
+    def __init__(self, n_symbols=1000, years=5, vector_dim=32, seed=0, end='2024-12-31'):
+        self.n_symbols = n_symbols
+        self.years = years
+        self.vector_dim = vector_dim
+        self.seed = seed
+        self.end = pd.Timestamp(end)
+        self.symbols = [ticker(i) for i in range(n_symbols)]
+        self.dates = pd.bdate_range(self.end - pd.DateOffset(years=years), self.end)
+        rng = np.random.default_rng(seed)
+        industries = [(sec, ind) for sec, inds in SECTORS.items() for ind in inds]
+        picks = rng.integers(0, len(industries), n_symbols)
+        self.sector = [industries[i][0] for i in picks]
+        self.industry = [industries[i][1] for i in picks]
+        self.exchange = rng.choice(EXCHANGES, n_symbols, p=[0.5, 0.45, 0.05])
+        self.base_ps = rng.lognormal(1.0, 0.6, n_symbols)
+        self.base_pe = rng.lognormal(3.0, 0.4, n_symbols)
+        self.base_dy = np.where(rng.random(n_symbols) < 0.3, 0.0, rng.gamma(2.0, 1.0, n_symbols))
+        # Sector centroids give the embeddings realistic neighbourhoods
+        centroids = {sec: rng.normal(size=(2, vector_dim)) for sec in SECTORS}
+        self.v_ps = np.stack([centroids[sec][0] for sec in self.sector]) + rng.normal(scale=0.7, size=(n_symbols, vector_dim))
+        self.v_rsi = np.stack([centroids[sec][1] for sec in self.sector]) + rng.normal(scale=0.7, size=(n_symbols, vector_dim))
+        self.positions = {sym: i for i, sym in enumerate(self.symbols)}
+
+    def _rng(self, sym):
+        return np.random.default_rng([self.seed, zlib.crc32(sym.encode())])
+
+    def daily_frame(self, sym) -> pd.DataFrame:
+        i = self.positions[sym]
+        rng = self._rng(sym)
+        n = len(self.dates)
+        p = 20 * np.exp(rng.normal(0.0003, 0.018, n).cumsum() + rng.normal(0, 0.5))
+        # Valuation multiples drift slowly around the symbol's base level
+        ps = self.base_ps[i] * np.exp(rng.normal(0, 0.004, n).cumsum())
+        pe = self.base_pe[i] * np.exp(rng.normal(0, 0.004, n).cumsum())
+        trend = pd.Series(p).rolling(60, min_periods=1).mean().to_numpy()
+        d = np.round(self.base_dy[i] * p[0] / 100, 2) * np.ones(n)
+        return pd.DataFrame({
+            'sym': sym,
+            'dt_st': self.dates,
+            'p': p,
+            'high_tp': trend * 1.25,
+            'mid_tp': trend * 1.1,
+            'low_tp': trend * 0.9,
+            'ps': ps,
+            'sps': p / ps,
+            'pe': pe,
+            'eps': p / pe,
+            'dy': np.where(p > 0, d / p * 100, 0.0),
+            'd': d,
+        })
+
+    def period_frame(self, sym, table) -> pd.DataFrame:
+        df = self.daily_frame(sym)
+        if table == 'fact_daily':
+            return df
+        rule = 'W-FRI' if table == 'fact' else 'ME'
+        # Last bar of each week/month, stamped with that bar's own date
+        return df.groupby(pd.Grouper(key='dt_st', freq=rule)).tail(1).reset_index(drop=True)
+
+    def _wire(self, df):
+        # What PostgREST sends: ISO date strings and plain floats
+        out = {'sym': df['sym'].tolist(), 'dt_st': df['dt_st'].dt.strftime('%Y-%m-%d').tolist()}
+        for col in df.columns.drop(['sym', 'dt_st']):
+            out[col] = _round(df[col].to_numpy())
+        return [dict(zip(out, values)) for values in zip(*out.values())]
+
+    def fact_rows(self, table, sym):
+        return self._wire(self.period_frame(sym, table))
+
+    def tech_rows(self, sym):
+        tech = compute_indicators(self.period_frame(sym, 'fact_monthly'))
+        return self._wire(tech)
+
+    def _types(self, values):
+        # Quartile buckets within the universe, like the app's pst/pet/dyt labels
+        ranks = pd.Series(values).rank(pct=True).to_numpy()
+        return [VALUATION_TYPES[min(int(r * 4), 3)] for r in ranks]
+
+    def dim_rows(self):
+        pst, pet, dyt = self._types(self.base_ps), self._types(self.base_pe), self._types(self.base_dy)
+        updated = (self.end - pd.Timedelta(days=1)).isoformat()
+        return [
+            {
+                'sym': sym, 'cn': f'{sym} Holdings', 'ind': self.industry[i], 'sec': self.sector[i],
+                'ps': round(float(self.base_ps[i]), 2), 'pst': pst[i],
+                'dy': round(float(self.base_dy[i]), 2), 'dyt': dyt[i],
+                'pe': round(float(self.base_pe[i]), 2), 'pet': pet[i],
+                'ex': str(self.exchange[i]), 'updated_at': updated,
+            }
+            for i, sym in enumerate(self.symbols)
+        ]
+
+    def _labels(self, i):
+        # A handful of yearly label points sitting on real bar dates
+        picks = self.dates[::252][-6:]
+        return json.dumps([
+            {
+                'dt_st': dt.strftime('%Y-%m-%d'),
+                'ps_first': round(float(self.base_ps[i]) * (0.8 + 0.05 * k), 2),
+                'pe_first': round(float(self.base_pe[i]) * (0.8 + 0.05 * k), 2),
+                'dy_first': round(float(self.base_dy[i]), 2),
+            }
+            for k, dt in enumerate(picks)
+        ])
+
+    def dim_det_rows(self):
+        dims = self.dim_rows()
+        rows = []
+        for i, dim in enumerate(dims):
+            row = dict(dim)
+            row.pop('updated_at')
+            for metric, base in (('ps', self.base_ps[i]), ('pe', self.base_pe[i]), ('dy', self.base_dy[i])):
+                # Gauge bands: historical min, 20/50/80th percentiles and max around the current value
+                for suffix, q in GAUGE_QUANTILES.items():
+                    row[f'{metric}{suffix}'] = round(float(base * (0.5 + q)), 2)
+                row[f'{metric}n'] = 20
+            row['sps'] = round(20 / float(self.base_ps[i]), 2)
+            row['eps'] = round(20 / float(self.base_pe[i]), 2)
+            row['d'] = round(float(self.base_dy[i]) * 0.2, 2)
+            row['trend_json_ss'] = self._labels(i)
+            # pgvector columns arrive as '[x,y,...]' strings
+            row['v_ps'] = row['v_ps_string'] = json.dumps(_round(self.v_ps[i], 4))
+            row['v_rsi'] = row['v_rsi_string'] = json.dumps(_round(self.v_rsi[i], 4))
+            rows.append(row)
+        return rows
+
+    def client(self, latency=0.0) -> FakeSupabase:
+        tables = {
+            'dim': RowTable(self.dim_rows()),
+            'dim_det': RowTable(self.dim_det_rows()),
+            'stocksuperhero_tech_monthly': GeneratedTable(self.symbols, self.tech_rows),
+            'app_keys': RowTable([{'key': 'bench', 'watchlist': []}]),
+            'app_key_events': RowTable(serial='id'),
+        }
+        for table in ('fact_daily', 'fact', 'fact_monthly'):
+            tables[table] = GeneratedTable(self.symbols, lambda sym, table=table: self.fact_rows(table, sym))
+        return FakeSupabase(tables, latency=latency)
@@ -1,8 +1,13 @@
+import math
+import numpy as np
+import streamlit as st
 from st_aggrid import AgGrid
 from st_aggrid.grid_options_builder import GridOptionsBuilder
 from st_aggrid.shared import GridUpdateMode, JsCode
+from functions.tracing import traced
 
 MAX_TABLE_HEIGHT = 500
+DEFAULT_PAGE_SIZE = 100
 
 def get_numeric_style_with_precision(precision: int) -> dict:
     return {"type": ["numericColumn", "customNumericFormat"], "precision": precision}
@@ -12,6 +17,7 @@ PRECISION_ONE = get_numeric_style_with_precision(1)
 PRECISION_TWO = get_numeric_style_with_precision(2)
 PINLEFT = {"pinned": "left"}
 
+@traced()
 def draw_grid(
         df,
         formatter: dict = None,
@@ -24,12 +30,13 @@ def draw_grid(
         auto_height: bool = False,
         grid_options: dict = None,
         key=None,
-        css: dict = None
+        css: dict = None,
+        filterable: bool = True
 ):
 
     gb = GridOptionsBuilder()
     gb.configure_default_column(
-        filterable=True,
+        filterable=filterable,
         groupable=False,
         editable=False,
         wrapText=wrap_text,
@@ -76,4 +83,80 @@ def highlight(values_with_colors):
             return params.value ? null : {{ 'backgroundColor': 'white', 'color': 'black' }};  // Default styles
         }};
     """
-    return JsCode(code)
\ No newline at end of file
+    return JsCode(code)
+
+
+def query_frame(df, sort_by=None, ascending=True, search=None, search_columns=('sym', 'cn'), ranges=None):
+    """Server-side sort and column filters; returns row positions into df."""
+    mask = np.ones(len(df), dtype=bool)
+    if search:
+        hits = np.zeros(len(df), dtype=bool)
+        for col in search_columns:
+            if col in df.columns:
+                hits |= df[col].astype(str).str.contains(search, case=False, regex=False).to_numpy()
+        mask &= hits
+    for col, (low, high) in (ranges or {}).items():
+        values = df[col].to_numpy(dtype=float, na_value=np.nan)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    positions = np.flatnonzero(mask)
+    if sort_by in df.columns and len(positions):
+        values = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+@traced()
+def paginate_frame(df, page, page_size=DEFAULT_PAGE_SIZE, **query):
+    positions = query_frame(df, **query)
+    total = len(positions)
+    n_pages = max(1, math.ceil(total / page_size))
+    page = min(max(1, page), n_pages)
+    start = (page - 1) * page_size
+    return df.iloc[positions[start:start + page_size]], total, n_pages, page
+
+
+def range_filters(df, columns, formatter, key):
+    # Min/max inputs per numeric column; only bounds that were set become query_frame ranges
+    ranges = {}
+    with st.expander("Column filters", expanded=False):
+        for col, column in zip(columns, st.columns(max(1, len(columns)))):
+            label = formatter.get(col, (col,))[0]
+            with column:
+                low = st.number_input(f"{label} min", value=None, key=f"{key}_{col}_min")
+                high = st.number_input(f"{label} max", value=None, key=f"{key}_{col}_max")
+            if low is not None or high is not None:
+                ranges[col] = (low, high)
+    return ranges
+
+
+def draw_paged_grid(df, formatter: dict, page_size=DEFAULT_PAGE_SIZE, key="paged_grid", sort_options=None, return_page=False,
+                    range_columns=None, **grid_kwargs):
+    # The full result stays on the server; only the current page is sent to AgGrid
+    sort_options = sort_options or [col for col in formatter if col in df.columns]
+    # Column filters run here over the whole frame; AgGrid's own filters would only see one page
+    if range_columns is None:
+        range_columns = [col for col in sort_options if df[col].dtype.kind in 'iuf']
+    grid_kwargs.setdefault('filterable', False)
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    with c1:
+        search = st.text_input("Search symbol or company", key=f"{key}_search")
+    with c2:
+        sort_by = st.selectbox("Sort by", [None] + sort_options, key=f"{key}_sort",
+                               format_func=lambda col: "—" if col is None else formatter.get(col, (col,))[0])
+    with c3:
+        ascending = st.toggle("Ascending", value=True, key=f"{key}_asc")
+    with c4:
+        page = st.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+    ranges = range_filters(df, range_columns, formatter, key) if range_columns else None
+    page_df, total, n_pages, page = paginate_frame(
+        df, page, page_size, sort_by=sort_by, ascending=ascending, search=search, ranges=ranges
+    )
+    st.caption(f"Rows {0 if total == 0 else (page - 1) * page_size + 1}–{min(page * page_size, total)} of {total} "
+               f"(page {page} of {n_pages}, {len(df)} before search and filters)")
+    response = draw_grid(page_df, formatter=formatter, key=f"{key}_{page}", **grid_kwargs)
+    # return_page also hands back the visible rows, e.g. to warm their details
+    return (response, page_df) if return_page else response
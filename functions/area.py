@@ -1,106 +1,128 @@
 import plotly.graph_objects as go
 import pandas as pd
 import streamlit as st
+from functions.figure_cache import cached_figure
+from functions.downsample import downsample_frame, point_budget
+from functions.render_backend import scatter_trace
+from functions.tracing import span, traced
 
-def plot_area_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color):
-    if not df_fact.empty:
-        # Plotting stock prices using Plotly
-        df_fact['dt_st'] = pd.to_datetime(df_fact['dt_st']).dt.strftime("%b %y").astype(str)
-        min_p = df_fact[metric_type].min()
-        max_p = df_fact['high_tp'].max()
-    
-        # Adjust the y-axis range: scale down the minimum and adjust the maximum
-        y_min = min_p * 0.9
-        y_max = max_p * 1.05
+@traced()
+def build_area_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color, max_points=None, downsample='lttb', backend=None):
+    # Bound the points sent to the browser; extremes of every plotted series are kept
+    if downsample:
+        df_fact = downsample_frame(df_fact, [metric_type, 'high_tp', 'mid_tp', 'low_tp'], max_points or point_budget(), method=downsample)
 
-        fig = go.Figure()
+    # Plotting stock prices using Plotly (on a copy, so the caller's frame is untouched)
+    # dt_st is already datetime64 from the schema decoder, only the label format is applied here
+    df_fact = df_fact.assign(dt_st=df_fact['dt_st'].dt.strftime("%b %y").astype(str))
+    min_p = df_fact[metric_type].min()
+    max_p = df_fact['high_tp'].max()
 
-        # Add the area chart for stock prices
-        fig.add_trace(go.Scatter(
-            x=df_fact['dt_st'], 
-            y=df_fact[metric_type],
-            fill='tozeroy', 
-            mode='lines', 
-            name=f"{selected_stock_symbol} Stock Prices",
-            hovertemplate='<b>Date:</b> %{x}<br><b>Price:</b> %{y}<extra></extra>',
-            #text=df_fact[metric_type],  # Add data labels
-            textposition="top center"
-        ))
+    # Adjust the y-axis range: scale down the minimum and adjust the maximum
+    y_min = min_p * 0.9
+    y_max = max_p * 1.05
 
-        # Add the line charts for high_tp, mid_tp, low_tp
-        fig.add_trace(go.Scatter(
-            x=df_fact['dt_st'], 
-            y=df_fact['high_tp'],
-            mode='lines', 
-            line=dict(color='red', width=2),
-            name='High TP',
-            hovertemplate='<b>Date:</b> %{x}<br><b>High TP:</b> %{y}<extra></extra>'
-        ))
+    # Long series switch to WebGL traces; same fill, hover and spikes either way
+    Scatter = scatter_trace(len(df_fact), backend)
 
-        fig.add_trace(go.Scatter(
-            x=df_fact['dt_st'], 
-            y=df_fact['mid_tp'],
-            mode='lines', 
-            line=dict(color='white', width=2),
-            name='Mid TP',
-            hovertemplate='<b>Date:</b> %{x}<br><b>Mid TP:</b> %{y}<extra></extra>'
-        ))
+    fig = go.Figure()
 
-        fig.add_trace(go.Scatter(
-            x=df_fact['dt_st'], 
-            y=df_fact['low_tp'],
-            mode='lines', 
-            line=dict(color='green', width=2),
-            name='Low TP',
-            hovertemplate='<b>Date:</b> %{x}<br><b>Low TP:</b> %{y}<extra></extra>'
-        ))
+    # Add the area chart for stock prices
+    fig.add_trace(Scatter(
+        x=df_fact['dt_st'], 
+        y=df_fact[metric_type],
+        fill='tozeroy', 
+        mode='lines', 
+        name=f"{selected_stock_symbol} Stock Prices",
+        hovertemplate='<b>Date:</b> %{x}<br><b>Price:</b> %{y}<extra></extra>',
+        #text=df_fact[metric_type],  # Add data labels
+        textposition="top center"
+    ))
 
-        # Customize layout
-        fig.update_layout(
-            #title=f"{selected_stock_symbol} Stock Prices",
-            xaxis_title=None,
-            yaxis_title=None,
-            showlegend=False, 
-            margin=dict(l=0, r=0, t=0, b=0),
-            height=400,
-            hovermode='x',
-            dragmode=False,
-            yaxis={
-                'showspikes': True,    
-                'spikemode': 'toaxis',
-                'spikecolor': 'rgba(191, 191, 191, 1)',
-                'spikethickness': 1,
-                'spikedash': 'dash',
-                'automargin': True, 
-                'tickfont': {'size': 12, 'color': 'LightSteelBlue'},
-                'tickwidth': 1,
-                'tickcolor': 'LightSteelBlue',
-                'ticklen': 4,
-                'ticklabelposition': 'inside top',
-                #'ticksuffix': "%",
-                #'tickprefix': "%",
-                'fixedrange': True,  # Add this line
-                'zeroline': False,
-                #'range': [0, max(df_fact['p']) * 1.1],  # Add this line
-                'range': [y_min, y_max],  # Set the dynamic y-axis range
-            },
-            xaxis={
-                'zeroline': False,
-                'showspikes': True,    
-                'spikemode': 'toaxis',
-                'spikecolor': 'rgba(191, 191, 191, 1)',
-                'spikethickness': 1,
-                'spikedash': 'dash',
-                'tickmode': 'linear',
-                'tickfont': {'size': 12, 'color': 'LightSteelBlue'},
-                'tickcolor': 'LightSteelBlue',
-                'dtick': 36, 
-                'tick0': False,
-                'range': [min(df_fact['dt_st']), max(df_fact['dt_st'])],
-            },
-            modebar=dict(remove=["zoom", "pan", "select2d", "lasso2d", "autoScale", "resetScale", "zoomIn", "zoomOut", "resetViews"]),
-        )
+    # Add the line charts for high_tp, mid_tp, low_tp
+    fig.add_trace(Scatter(
+        x=df_fact['dt_st'], 
+        y=df_fact['high_tp'],
+        mode='lines', 
+        line=dict(color='red', width=2),
+        name='High TP',
+        hovertemplate='<b>Date:</b> %{x}<br><b>High TP:</b> %{y}<extra></extra>'
+    ))
+
+    fig.add_trace(Scatter(
+        x=df_fact['dt_st'], 
+        y=df_fact['mid_tp'],
+        mode='lines', 
+        line=dict(color='white', width=2),
+        name='Mid TP',
+        hovertemplate='<b>Date:</b> %{x}<br><b>Mid TP:</b> %{y}<extra></extra>'
+    ))
+
+    fig.add_trace(Scatter(
+        x=df_fact['dt_st'], 
+        y=df_fact['low_tp'],
+        mode='lines', 
+        line=dict(color='green', width=2),
+        name='Low TP',
+        hovertemplate='<b>Date:</b> %{x}<br><b>Low TP:</b> %{y}<extra></extra>'
+    ))
 
-        st.plotly_chart(fig)
+    # Customize layout
+    fig.update_layout(
+        #title=f"{selected_stock_symbol} Stock Prices",
+        xaxis_title=None,
+        yaxis_title=None,
+        showlegend=False, 
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=400,
+        hovermode='x',
+        dragmode=False,
+        yaxis={
+            'showspikes': True,    
+            'spikemode': 'toaxis',
+            'spikecolor': 'rgba(191, 191, 191, 1)',
+            'spikethickness': 1,
+            'spikedash': 'dash',
+            'automargin': True, 
+            'tickfont': {'size': 12, 'color': 'LightSteelBlue'},
+            'tickwidth': 1,
+            'tickcolor': 'LightSteelBlue',
+            'ticklen': 4,
+            'ticklabelposition': 'inside top',
+            #'ticksuffix': "%",
+            #'tickprefix': "%",
+            'fixedrange': True,  # Add this line
+            'zeroline': False,
+            #'range': [0, max(df_fact['p']) * 1.1],  # Add this line
+            'range': [y_min, y_max],  # Set the dynamic y-axis range
+        },
+        xaxis={
+            'zeroline': False,
+            'showspikes': True,    
+            'spikemode': 'toaxis',
+            'spikecolor': 'rgba(191, 191, 191, 1)',
+            'spikethickness': 1,
+            'spikedash': 'dash',
+            'tickmode': 'linear',
+            'tickfont': {'size': 12, 'color': 'LightSteelBlue'},
+            'tickcolor': 'LightSteelBlue',
+            'dtick': 36, 
+            'tick0': False,
+            'range': [min(df_fact['dt_st']), max(df_fact['dt_st'])],
+        },
+        modebar=dict(remove=["zoom", "pan", "select2d", "lasso2d", "autoScale", "resetScale", "zoomIn", "zoomOut", "resetViews"]),
+    )
+
+    return fig
+
+def plot_area_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color, period=None, max_points=None, downsample='lttb', backend=None):
+    if not df_fact.empty:
+        fig = cached_figure(
+            'area', selected_stock_symbol, period, metric_type, [df_fact],
+            lambda: build_area_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color, max_points, downsample, backend),
+            color=metric_color, max_points=max_points, downsample=downsample, backend=backend,
+        )
+        with span('render.area'):
+            st.plotly_chart(fig)
     else:
         st.warning(f"No stock price data found for {selected_stock_symbol}.")
\ No newline at end of file
@@ -0,0 +1,194 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from functions.db import execute, get_client
+from functions.persistence import load_watchlist
+
+KEY_TTL = 3600
+NEGATIVE_TTL = 300
+SESSION_TTL = 7 * 24 * 3600
+MAX_ATTEMPTS = 5
+ATTEMPT_WINDOW = 60
+# Unknown keys one client may try per NEGATIVE_TTL; rotating keys can't get past this,
+# and only the client doing it is held back
+MAX_CLIENT_FAILURES = 10
+
+
+def hash_key(user_key):
+    return hashlib.sha256(user_key.encode()).hexdigest()
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def client_id():
+    # The connection's IP, or the browser session when there is none (e.g. localhost)
+    ip = st.context.ip_address
+    if ip:
+        return ip
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+@dataclass
+class AuthResult:
+    status: str  # 'ok', 'invalid' or 'rate_limited'
+    user_key: str = None
+    watchlist: list = None
+    token: str = None
+
+
+class Authenticator:
+    """Access-key validation backed by an in-memory cache keyed on the key's SHA-256.
+
+    Valid keys are cached for KEY_TTL and bad keys for NEGATIVE_TTL, and each key hash
+    gets at most MAX_ATTEMPTS lookups per ATTEMPT_WINDOW, so repeated or brute-force
+    attempts are answered locally. A client that tries MAX_CLIENT_FAILURES unknown keys
+    within NEGATIVE_TTL is held back until the oldest one ages out. A successful login issues an HMAC-signed session
+    token that later sessions can resume while the key is cached, and re-validate once
+    it has expired.
+    """
+
+    def __init__(self, supabase, secret=None):
+        self.supabase = supabase
+        # Without a configured secret tokens only live as long as this process
+        self.secret = (secret or secrets.token_hex(32)).encode()
+        self._valid = {}
+        self._invalid = {}
+        self._attempts = {}
+        self._failures = {}
+        self._pruned = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _allow(attempts, limit, now):
+        while attempts and now - attempts[0] > ATTEMPT_WINDOW:
+            attempts.popleft()
+        if len(attempts) >= limit:
+            return False
+        attempts.append(now)
+        return True
+
+    def _prune(self, now):
+        # Called under the lock; drops expired entries at most once per window
+        if now - self._pruned < ATTEMPT_WINDOW:
+            return
+        self._pruned = now
+        # Valid keys stay so their tokens can re-validate on resume
+        for key_hash in [k for k, until in self._invalid.items() if until <= now]:
+            del self._invalid[key_hash]
+        for key_hash in [k for k, v in self._attempts.items() if not v or now - v[-1] > ATTEMPT_WINDOW]:
+            del self._attempts[key_hash]
+        for client in [c for c, v in self._failures.items() if not v or now - v[-1] > NEGATIVE_TTL]:
+            del self._failures[client]
+
+    def _client_blocked(self, client, now):
+        # Called under the lock
+        failures = self._failures.get(client)
+        while failures and now - failures[0] > NEGATIVE_TTL:
+            failures.popleft()
+        return failures is not None and len(failures) >= MAX_CLIENT_FAILURES
+
+    def _rate_limited(self, key_hash, now):
+        with self._lock:
+            self._prune(now)
+            return not self._allow(self._attempts.setdefault(key_hash, deque()), MAX_ATTEMPTS, now)
+
+    def _validate(self, user_key, key_hash, now, client=None):
+        # Cached record for a known-good key, None for a bad one (counted against client)
+        record = self._lookup(user_key)
+        with self._lock:
+            if record is None:
+                self._invalid[key_hash] = now + NEGATIVE_TTL
+                self._valid.pop(key_hash, None)
+                if client is not None:
+                    self._failures.setdefault(client, deque()).append(now)
+                return None
+            cached = (record, now + KEY_TTL)
+            self._valid[key_hash] = cached
+            return cached
+
+    def _lookup(self, user_key):
+        response = execute(self.supabase.table('app_keys').select('watchlist, watchlist_event_id').eq('key', user_key))
+        if not response.data:
+            return None
+        row = response.data[0]
+        watchlist = load_watchlist(user_key, row.get('watchlist') or [], row.get('watchlist_event_id'))
+        return {'user_key': user_key, 'watchlist': watchlist}
+
+    def login(self, user_key, client=None) -> AuthResult:
+        """``client`` identifies the caller (see client_id()) for the unknown-key limit."""
+        key_hash = hash_key(user_key)
+        now = time.monotonic()
+        if self._rate_limited(key_hash, now):
+            return AuthResult('rate_limited')
+        with self._lock:
+            if self._invalid.get(key_hash, 0) > now:
+                return AuthResult('invalid')
+            cached = self._valid.get(key_hash)
+            if (cached is None or cached[1] <= now) and self._client_blocked(client, now):
+                return AuthResult('rate_limited')
+        if cached is None or cached[1] <= now:
+            cached = self._validate(user_key, key_hash, now, client)
+            if cached is None:
+                return AuthResult('invalid')
+        record = cached[0]
+        return AuthResult('ok', record['user_key'], list(record['watchlist']), self.issue_token(key_hash))
+
+    def issue_token(self, key_hash):
+        payload = _b64(json.dumps({'kh': key_hash, 'exp': int(time.time()) + SESSION_TTL}).encode())
+        signature = _b64(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+        return f'{payload}.{signature}'
+
+    def resume(self, token) -> AuthResult:
+        """Restore a session from a token; no database round trip while the key is cached."""
+        try:
+            payload, signature = token.split('.')
+            expected = _b64(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+            if not hmac.compare_digest(signature, expected):
+                return AuthResult('invalid')
+            claims = json.loads(_unb64(payload))
+        except (ValueError, TypeError):
+            return AuthResult('invalid')
+        if claims.get('exp', 0) < time.time():
+            return AuthResult('invalid')
+        with self._lock:
+            cached = self._valid.get(claims.get('kh'))
+        if cached is None:
+            # Signed but unknown here (e.g. after a restart): the user logs in once more
+            return AuthResult('invalid')
+        now = time.monotonic()
+        if cached[1] <= now:
+            # The cached key expired: check it is still in app_keys before resuming
+            # Signed tokens can't be forged, so this lookup needs no per-client limit
+            cached = self._validate(cached[0]['user_key'], claims['kh'], now)
+            if cached is None:
+                return AuthResult('invalid')
+        record = cached[0]
+        return AuthResult('ok', record['user_key'], list(record['watchlist']), token)
+
+    def remember_watchlist(self, user_key, watchlist):
+        # Keep resumed sessions in step with watchlist changes made in this process
+        with self._lock:
+            cached = self._valid.get(hash_key(user_key))
+            if cached is not None:
+                cached[0]['watchlist'] = list(watchlist)
+
+
+@st.cache_resource(show_spinner=False)
+def get_authenticator() -> Authenticator:
+    secret = st.secrets.get("auth", {}).get("secret")
+    return Authenticator(get_client(), secret=secret)
@@ -1,30 +1,85 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
+from functions.tracing import traced
 
-def plot_bar_chart(filtered_df, selected_stock_symbol):
+# Largest and smallest P/S symbols drawn individually; everything else is summarized,
+# so the figure never grows past 2 * TOP_K + 1 symbol bars plus one bar per sector
+TOP_K = 30
+
+
+def select_bars(filtered_df, selected_stock_symbol, top_k=TOP_K):
+    """Split the frame into bars drawn per symbol (sorted by ps, descending) and the rest.
+
+    Uses argpartition for the top/bottom K, so the cost is linear in the filtered rows.
+    The selected symbol is always among the drawn bars.
+    """
+    ps = pd.to_numeric(filtered_df['ps'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    valid = np.flatnonzero(~np.isnan(ps))
+    if len(valid) <= 2 * top_k:
+        keep = valid
+    else:
+        values = ps[valid]
+        top = valid[np.argpartition(-values, top_k - 1)[:top_k]]
+        bottom = valid[np.argpartition(values, top_k - 1)[:top_k]]
+        keep = np.union1d(top, bottom)
+        selected = np.flatnonzero(filtered_df['sym'].to_numpy() == selected_stock_symbol)
+        keep = np.union1d(keep, selected[~np.isnan(ps[selected])])
+    keep = keep[np.argsort(-ps[keep], kind='stable')]
+    rest = np.setdiff1d(valid, keep, assume_unique=True)
+    return filtered_df.iloc[keep], filtered_df.iloc[rest]
+
+
+def summarize_rest(rest_df):
+    # One bar per sector (median P/S, count); a single bucket when there is no sector column
+    if rest_df.empty:
+        return pd.DataFrame(columns=['label', 'ps', 'count'])
+    if 'sec' in rest_df.columns:
+        grouped = rest_df.groupby('sec', observed=True, sort=False)['ps']
+        summary = pd.DataFrame({'ps': grouped.median(), 'count': grouped.size()}).reset_index()
+        summary['label'] = summary['sec'].astype(str) + ' (' + summary['count'].astype(str) + ')'
+    else:
+        summary = pd.DataFrame({'label': [f'Others ({len(rest_df)})'], 'ps': [rest_df['ps'].median()], 'count': [len(rest_df)]})
+    return summary.sort_values('ps', ascending=False)[['label', 'ps', 'count']]
+
+
+@traced()
+def plot_bar_chart(filtered_df, selected_stock_symbol, top_k=TOP_K):
     if not filtered_df.empty and 'sym' in filtered_df.columns and 'ps' in filtered_df.columns:
-        filtered_df = filtered_df.sort_values(by='ps', ascending=False)
-        
+        bars_df, rest_df = select_bars(filtered_df, selected_stock_symbol, top_k)
+
         fig_bar = go.Figure()
 
-        # Add bar chart
+        # Add bar chart; the selected symbol is highlighted with a vectorized color array
         fig_bar.add_trace(go.Bar(
-            x=filtered_df['sym'], y=filtered_df['ps'],
-            marker_color='steelblue', name='PS Metric',
-            text=filtered_df['ps'],  # Add data labels
+            x=bars_df['sym'], y=bars_df['ps'],
+            marker_color=np.where(bars_df['sym'].to_numpy() == selected_stock_symbol, 'orange', 'dodgerblue'),
+            name='PS Metric',
+            texttemplate='%{y}',  # Add data labels
             textposition='auto',
             hoverinfo='text+name',
             hovertemplate='<b>Symbol:</b> %{x}<br><b>PS Metric:</b> %{y}<extra></extra>'
         ))
 
-        # Highlight selected symbol
-        fig_bar.update_traces(
-            marker=dict(color=['orange' if sym == selected_stock_symbol else 'dodgerblue' for sym in filtered_df['sym']])
-        )
+        # Symbols outside the top/bottom K, summarized per sector
+        summary = summarize_rest(rest_df)
+        if not summary.empty:
+            fig_bar.add_trace(go.Bar(
+                x=summary['label'], y=summary['ps'],
+                marker_color='slategray', name='Median PS (rest)',
+                customdata=summary['count'],
+                texttemplate='%{y:.2f}',
+                textposition='auto',
+                hovertemplate='<b>%{x}</b><br><b>Median PS:</b> %{y:.2f}<br><b>Symbols:</b> %{customdata}<extra></extra>'
+            ))
 
         # Customize layout
         fig_bar.update_layout(
             #title="PS Metric Bar Chart",
             height=400,
+            # The two traces never share a category; grouping would halve and shift every bar
+            barmode='overlay',
+            showlegend=False,
             margin=dict(l=0, r=0, t=0, b=0),
             xaxis={  
                 'fixedrange':True, 
@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import streamlit as st
+from supabase import create_client, Client, ClientOptions
+from functions.tracing import propagate, span, traced
+
+DEFAULT_TIMEOUT = 10
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 60
+PAGE_SIZE = 1000
+
+
+class SupabasePool:
+    """One Supabase client for the whole process, backed by a pooled keep-alive httpx session.
+
+    Queries are executed on a bounded worker pool sized to the connection limit, which
+    gives every call its own timeout and lets us count how many connections are busy.
+    """
+
+    def __init__(self, url=None, key=None, max_connections=MAX_CONNECTIONS, timeout=DEFAULT_TIMEOUT, client=None):
+        self.timeout = timeout
+        self.http = None
+        self.client = client
+        if client is None:
+            self.http = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                # Hard cap on the socket; per-call timeouts are enforced in execute()
+                timeout=httpx.Timeout(timeout * 3, connect=timeout),
+            )
+            self.client = create_client(url, key, options=ClientOptions(
+                httpx_client=self.http,
+                postgrest_client_timeout=timeout * 3,
+            ))
+        self.executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='supabase')
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.calls = 0
+        self.timeouts = 0
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def _run(self, query):
+        with self._lock:
+            self._in_use += 1
+            self.calls += 1
+        try:
+            with span('supabase.query'):
+                return query.execute()
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    def submit(self, query):
+        # Returns a Future so callers can fan out several queries at once
+        return self.executor.submit(propagate(self._run), query)
+
+    def execute(self, query, timeout=None):
+        future = self.submit(query)
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self):
+        return {'in_use': self._in_use, 'calls': self.calls, 'timeouts': self.timeouts}
+
+
+# Shared by every Streamlit session and thread in this process
+@st.cache_resource(show_spinner=False)
+def _shared_pool() -> SupabasePool:
+    return SupabasePool(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"])
+
+
+_override = None
+
+
+def use_client(client, max_connections=MAX_CONNECTIONS, timeout=DEFAULT_TIMEOUT) -> SupabasePool:
+    """Route every query in this process through ``client`` instead of the live project.
+
+    ``client`` only needs the supabase-py query surface (e.g. the benchmark stand-in).
+    Call it before the first query; cached resources keep whichever client they saw first.
+    """
+    global _override
+    _override = SupabasePool(max_connections=max_connections, timeout=timeout, client=client)
+    return _override
+
+
+def get_pool() -> SupabasePool:
+    return _override if _override is not None else _shared_pool()
+
+
+def get_client() -> Client:
+    return get_pool().client
+
+
+def execute(query, timeout=None):
+    return get_pool().execute(query, timeout=timeout)
+
+
+# PostgREST caps each response, so page through the table with range().
+# Pages are only stable under a total order: ``order`` must be a column (or tuple of
+# columns) that is unique over the filtered rows, otherwise rows can be skipped or repeated.
+@traced()
+def fetch_all(build_query, order, page_size=PAGE_SIZE, timeout=None):
+    order = (order,) if isinstance(order, str) else tuple(order)
+    if not order:
+        raise ValueError("fetch_all needs an order column to page deterministically")
+    rows = []
+    start = 0
+    while True:
+        query = build_query()
+        for column in order:
+            query = query.order(column)
+        response = execute(query.range(start, start + page_size - 1), timeout=timeout)
+        rows.extend(response.data)
+        if len(response.data) < page_size:
+            return rows
+        start += page_size
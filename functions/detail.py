@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+import pandas as pd
+import streamlit as st
+from functions.db import execute, get_client, get_pool
+from functions.fact_store import get_fact_store
+from functions.indicators import get_indicator_cache
+from functions.rollup import DAILY_TABLE
+from functions.schema import decode
+from functions.vector_search import RESULT_COLUMNS, get_supabase_dataframe, get_vector_index
+from functions.tracing import propagate, traced
+
+# Light core row fetched on every selection; the heavy columns are loaded on demand
+DIM_DET_COLUMNS = 'sym, pst, cn, ind, sec, ps, sps, psmin, ps2, ps5, ps8, psmax, psn, pst, pe, eps, pemin, pe2, pe5, pe8, pemax, pen, pet, dy, d, dymin, dy2, dy5, dy8, dymax, dyn, dyt, ex'
+# Heavy columns every detail render needs; warmed in the background with each bundle
+WARM_COLUMNS = ['trend_json_ss']
+HEAVY_TTL = 600
+MAX_HEAVY_SYMBOLS = 1024
+FACT_COLUMNS = 'sym, dt_st, p, high_tp, mid_tp, low_tp, ps, sps, pe, eps, dy, d'
+
+# Runs the local fact store sync, the heavy-column warm-up and the RPC fallback that has to wait on dim_det
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='detail')
+
+
+def _columns(select):
+    return list(dict.fromkeys(c.strip() for c in select.split(',')))
+
+
+@dataclass
+class DetailBundle:
+    symbol: str
+    fact_table: str
+    dim_det: pd.DataFrame
+    fact: pd.DataFrame
+    tech: pd.DataFrame
+    vectors: pd.DataFrame
+    # source name -> error message for every fetch that failed
+    errors: dict = field(default_factory=dict)
+    # The symbol's replicated daily bars, if any; they continue the stored weekly and monthly bars
+    daily: pd.DataFrame = None
+
+    def ok(self, source):
+        return source not in self.errors
+
+    def derives(self, fact_table):
+        # Another period needs the daily bars, and for weekly/monthly that table in the replica
+        if self.daily is None:
+            return False
+        return fact_table == DAILY_TABLE or get_fact_store().watermark(fact_table, self.symbol) is not None
+
+    def for_period(self, fact_table):
+        """The same bundle at another period, read from the local replica without any fetch."""
+        if fact_table == DAILY_TABLE:
+            fact = self.daily
+        else:
+            fact = get_fact_store().bars(fact_table, [self.symbol], sync=False)[self.symbol]
+        return replace(self, fact_table=fact_table, fact=fact, tech=get_indicator_cache().get(fact_table, fact), errors=dict(self.errors))
+
+
+def _frame(future, select, source, errors, timeout):
+    try:
+        result = future.result(timeout=timeout)
+        if isinstance(result, pd.DataFrame):
+            return result
+        if result.data:
+            return decode(result.data, source)
+    except Exception as e:
+        errors[source] = str(e) or type(e).__name__
+    return decode([], source, _columns(select))
+
+
+class DimDetColumns:
+    """Per-symbol cache of heavy dim_det columns (embeddings, trend JSON, vector strings).
+
+    Each request fetches only the columns not yet cached for that symbol, in one query,
+    so a panel pays for its own columns the first time it renders and never again.
+    """
+
+    def __init__(self, supabase, ttl=HEAVY_TTL, max_symbols=MAX_HEAVY_SYMBOLS):
+        self.supabase = supabase
+        self.ttl = ttl
+        self.max_symbols = max_symbols
+        # symbol -> {column: (value, loaded_at)}
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _missing(self, symbol, columns, now):
+        entry = self.entries.get(symbol, {})
+        return [col for col in columns if col not in entry or now - entry[col][1] > self.ttl]
+
+    @traced()
+    def get(self, symbol, columns, timeout=None) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            missing = self._missing(symbol, columns, now)
+        if missing:
+            response = execute(self.supabase.table('dim_det').select(', '.join(missing)).eq('sym', symbol), timeout=timeout)
+            df = decode(response.data[:1], 'dim_det', missing)
+            # An unknown symbol caches None so it is not refetched on every rerun
+            row = df.iloc[0].to_dict() if len(df) else {}
+            with self._lock:
+                entry = self.entries.setdefault(symbol, {})
+                for col in missing:
+                    entry[col] = (row.get(col), now)
+        with self._lock:
+            entry = self.entries.get(symbol, {})
+            self.entries.move_to_end(symbol)
+            while len(self.entries) > self.max_symbols:
+                self.entries.popitem(last=False)
+            return {col: entry[col][0] if col in entry else None for col in columns}
+
+
+@st.cache_resource(show_spinner=False)
+def get_dim_det_columns() -> DimDetColumns:
+    return DimDetColumns(get_client())
+
+
+def load_dim_det_columns(symbol, columns, timeout=None) -> dict:
+    """Heavy dim_det values for one symbol, e.g. ['trend_json_ss'] for the chart labels."""
+    return get_dim_det_columns().get(symbol, list(columns), timeout=timeout)
+
+
+def _load_bars(fact_table, symbol):
+    return get_fact_store().bars(fact_table, [symbol])[symbol]
+
+
+def _rpc_vectors(symbol, timeout, match_count):
+    # Only this fallback needs the symbol's own embeddings
+    row = load_dim_det_columns(symbol, ['v_ps', 'v_rsi'], timeout=timeout)
+    if row['v_ps'] is None or row['v_rsi'] is None:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return get_supabase_dataframe(row['v_ps'].tolist(), row['v_rsi'].tolist(), match_count=match_count)
+
+
+@traced()
+def load_detail(symbol, fact_table, match_count=100, timeout=None) -> DetailBundle:
+    """Fetch everything the detail panel needs for one symbol concurrently.
+
+    Latency is roughly the slowest single query; a failing source leaves an empty
+    frame in the bundle and an entry in ``errors`` instead of raising.
+    """
+    pool = get_pool()
+    supabase = get_client()
+    timeout = timeout or pool.timeout
+    errors = {}
+
+    dim_det_future = pool.submit(supabase.table('dim_det').select(DIM_DET_COLUMNS).eq('sym', symbol))
+    # Bars come from the local replica, which only pulls rows past its dt_st watermarks;
+    # weekly and monthly bars are the stored table plus a rollup of the daily tail
+    fact_future = _executor.submit(propagate(_load_bars), fact_table, symbol)
+    # Nobody waits on this: the chart labels read it from the column cache, so a
+    # prefetched symbol renders without its own dim_det round trip
+    _executor.submit(propagate(load_dim_det_columns), symbol, WARM_COLUMNS, timeout)
+
+    # The local index already holds this symbol's vectors, so the search does not wait on dim_det
+    vectors = None
+    try:
+        index = get_vector_index()
+        if symbol in index.positions:
+            vectors = index.search_symbol(symbol, match_count=match_count)
+    except Exception as e:
+        errors['vectors'] = str(e) or type(e).__name__
+    vector_future = None
+    if vectors is None:
+        vector_future = _executor.submit(propagate(_rpc_vectors), symbol, timeout, match_count)
+
+    dim_det = _frame(dim_det_future, DIM_DET_COLUMNS, 'dim_det', errors, timeout)
+    fact = _frame(fact_future, FACT_COLUMNS, fact_table, errors, timeout)
+    # Kept only when the symbol's daily history is replicated, so period switches stay local
+    daily = fact if fact_table == DAILY_TABLE else get_fact_store().read(DAILY_TABLE, symbol)
+    daily = daily if not daily.empty else None
+    # MACD/RSI are computed locally at the selected period; reloads only extend them past the last closed bar
+    tech = get_indicator_cache().get(fact_table, fact)
+    if vector_future is not None:
+        try:
+            vectors = vector_future.result(timeout=timeout)
+            errors.pop('vectors', None)
+        except Exception as e:
+            errors['vectors'] = str(e) or type(e).__name__
+            vectors = pd.DataFrame(columns=RESULT_COLUMNS)
+
+    return DetailBundle(symbol, fact_table, dim_det, fact, tech, vectors, errors, daily)
@@ -0,0 +1,135 @@
+import threading
+import time
+import pandas as pd
+import streamlit as st
+from functions.db import fetch_all, get_client
+from functions.schema import decode
+from functions.tracing import traced
+
+DIM_COLUMNS = 'sym, cn, ind, sec, ps, pst, dy, dyt, pe, pet, ex'
+DIM_WATERMARK = 'updated_at'
+DIM_TTL = 300
+# Deletes are invisible to the watermark, so every Nth refresh reloads everything
+FULL_REFRESH_EVERY = 12
+
+
+def _missing_column(error, column):
+    # PostgREST reports an unknown column as Postgres undefined_column (42703)
+    code = getattr(error, 'code', None)
+    if code is None and error.args and isinstance(error.args[0], dict):
+        code = error.args[0].get('code')
+    return code == '42703' or (column in str(error) and 'does not exist' in str(error))
+
+
+class DimCache:
+    """Process-wide, read-only copy of the dim universe.
+
+    After the TTL expires only rows whose watermark moved are pulled and merged in.
+    Callers share the cached frame and must treat it as read-only; pandas copy-on-write
+    gives every derived filter/assignment its own data.
+    """
+
+    def __init__(self, supabase, ttl=DIM_TTL, watermark=DIM_WATERMARK, full_refresh_every=FULL_REFRESH_EVERY):
+        self.supabase = supabase
+        self.ttl = ttl
+        self.watermark = watermark
+        self.full_refresh_every = full_refresh_every
+        self.frame = None
+        self.version = 0
+        self.loaded_at = 0.0
+        self.last_watermark = None
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def _select(self):
+        columns = DIM_COLUMNS if self.watermark is None else f'{DIM_COLUMNS}, {self.watermark}'
+        return self.supabase.table('dim').select(columns)
+
+    def _prepare(self, df):
+        df = df.copy()
+        df['sym_cn'] = df['sym'] + " - " + df['cn']
+        # Concatenating refreshed rows widens categoricals to object; restore them
+        for col in ('ex', 'ind', 'sec', 'pst', 'pet', 'dyt'):
+            if col in df.columns and df[col].dtype != 'category':
+                df[col] = df[col].astype('category')
+        return df.reset_index(drop=True)
+
+    @traced()
+    def _full_load(self):
+        try:
+            rows = fetch_all(self._select, 'sym')
+        except Exception as e:
+            # Only a missing watermark column disables incremental refresh for good;
+            # timeouts and connection errors propagate and the next refresh retries as-is
+            if self.watermark is None or not _missing_column(e, self.watermark):
+                raise
+            self.watermark = None
+            rows = fetch_all(self._select, 'sym')
+        df = decode(rows, 'dim', None if rows else [c.strip() for c in DIM_COLUMNS.split(',')])
+        self.frame = self._prepare(df)
+        self._set_watermark(df)
+
+    def _set_watermark(self, df):
+        if self.watermark is not None and self.watermark in df.columns and not df.empty:
+            latest = df[self.watermark].max()
+            if self.last_watermark is None or latest > self.last_watermark:
+                self.last_watermark = latest
+
+    @traced()
+    def _incremental_load(self):
+        rows = fetch_all(lambda: self._select().gt(self.watermark, self.last_watermark.isoformat()), 'sym')
+        if not rows:
+            return False
+        changed = decode(rows, 'dim')
+        kept = self.frame[~self.frame['sym'].isin(changed['sym'])]
+        self.frame = self._prepare(pd.concat([kept, changed], ignore_index=True))
+        self._set_watermark(changed)
+        return True
+
+    def expired(self):
+        return self.frame is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def _refresh(self, full):
+        incremental = (
+            not full
+            and self.frame is not None
+            and self.watermark is not None
+            and self.last_watermark is not None
+            and self.refreshes % self.full_refresh_every != 0
+        )
+        if incremental:
+            changed = self._incremental_load()
+        else:
+            self._full_load()
+            changed = True
+        if changed:
+            self.version += 1
+        self.refreshes += 1
+        self.loaded_at = time.monotonic()
+
+    def refresh(self, full=False):
+        with self._lock:
+            self._refresh(full)
+
+    def get(self) -> pd.DataFrame:
+        if self.expired():
+            with self._lock:
+                # Another session may have refreshed while we waited for the lock
+                if self.expired():
+                    self._refresh(full=False)
+        return self.frame
+
+    def snapshot(self):
+        # (version, frame) pair used to key per-snapshot derived structures
+        self.get()
+        with self._lock:
+            return self.version, self.frame
+
+
+@st.cache_resource(show_spinner=False)
+def get_dim_cache() -> DimCache:
+    return DimCache(get_client())
+
+
+def get_dim() -> pd.DataFrame:
+    return get_dim_cache().get()
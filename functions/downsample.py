@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from functions.tracing import traced
+
+DEFAULT_CHART_WIDTH = 1200
+POINTS_PER_PIXEL = 1.0
+MIN_POINTS = 100
+
+
+def point_budget(width=DEFAULT_CHART_WIDTH, points_per_pixel=POINTS_PER_PIXEL):
+    # More points than horizontal pixels cannot be told apart on screen
+    return max(MIN_POINTS, int(width * points_per_pixel))
+
+
+def _bucket_bounds(n, n_buckets):
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def minmax_indices(y, n_out):
+    """Min and max of each bucket: keeps every spike, fully vectorized."""
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    bounds = _bucket_bounds(n, max(1, n_out // 2))
+    starts = bounds[:-1]
+    sizes = np.diff(bounds)
+    bucket = np.repeat(np.arange(len(starts)), sizes)
+    low = np.where(np.isnan(y), np.inf, y)
+    high = np.where(np.isnan(y), -np.inf, y)
+    mins = np.minimum.reduceat(low, starts)
+    maxs = np.maximum.reduceat(high, starts)
+    # First position in each bucket that hits the bucket min / max
+    _, first_min = np.unique(bucket[low == mins[bucket]], return_index=True)
+    _, first_max = np.unique(bucket[high == maxs[bucket]], return_index=True)
+    min_idx = np.flatnonzero(low == mins[bucket])[first_min]
+    max_idx = np.flatnonzero(high == maxs[bucket])[first_max]
+    return np.unique(np.concatenate([min_idx, max_idx, [0, n - 1]]))
+
+
+def lttb_indices(y, n_out, x=None):
+    """Largest-Triangle-Three-Buckets over evenly spaced (or given) x positions."""
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype='float64') if x is None else np.asarray(x, dtype='float64')
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average point of every bucket, computed once up front
+    sums_x = np.add.reduceat(x[1:n - 1], bounds[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], bounds[:-1] - 1)
+    counts = np.diff(bounds)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = bounds[b], bounds[b + 1]
+        # Triangle area between the previous pick, each candidate and the next bucket's average
+        area = np.abs(
+            (x[prev] - avg_x[b + 1]) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y[b + 1] - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        selected[b + 1] = prev
+    return selected
+
+
+@traced()
+def downsample_frame(df, columns, n_out, method='lttb', keep=None):
+    """Reduce df to about n_out rows before figure construction.
+
+    The union of picks over ``columns`` is kept, plus each column's global min/max and
+    any rows flagged in the ``keep`` mask (e.g. label dates), so extremes and labels survive.
+    """
+    n = len(df)
+    if method is None or n <= n_out:
+        return df
+    # The first column drives the shape; the others share the rest of the budget
+    budgets = [n_out] if len(columns) == 1 else [n_out // 2] + [max(3, n_out // 2 // (len(columns) - 1))] * (len(columns) - 1)
+    picks = [np.array([0, n - 1])]
+    for col, budget in zip(columns, budgets):
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        if method == 'minmax':
+            picks.append(minmax_indices(values, budget))
+        else:
+            picks.append(lttb_indices(values, budget))
+        if np.isfinite(values).any():
+            picks.append([np.nanargmin(values), np.nanargmax(values)])
+    if keep is not None:
+        picks.append(np.flatnonzero(np.asarray(keep)))
+    return df.iloc[np.unique(np.concatenate(picks).astype(np.int64))]
+
+
+def label_mask(dates, label_dates):
+    # First row for every label date, so text labels still have a point to sit on
+    dates = pd.Series(np.asarray(dates))
+    hits = dates.isin(set(label_dates))
+    return (hits & ~dates.where(hits).duplicated()).to_numpy()
@@ -0,0 +1,226 @@
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import streamlit as st
+from functions.db import fetch_all, get_client
+from functions.rollup import DAILY_TABLE, PERIOD_FREQS, extend_bars, tail_start
+from functions.schema import decode
+from functions.tracing import traced
+
+FACT_TABLES = ['fact_daily', 'fact', 'fact_monthly']
+FACT_COLUMNS = ['sym', 'dt_st', 'p', 'high_tp', 'mid_tp', 'low_tp', 'ps', 'sps', 'pe', 'eps', 'dy', 'd']
+STORE_ROOT = os.environ.get('STOCKSUPERHERO_STORE', '.fact_store')
+FIXTURE_DIR = os.environ.get('STOCKSUPERHERO_FIXTURES', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fixtures'))
+OFFLINE = os.environ.get('STOCKSUPERHERO_OFFLINE', '') not in ('', '0', 'false')
+SYNC_CHUNK_SIZE = 50
+
+
+class FactStore:
+    """Local Parquet replica of the fact tables, one file per period table and symbol.
+
+    Layout is ``<root>/period=<table>/sym=<SYM>/part.parquet`` so a single symbol is one
+    memory-mapped read and the whole period can be scanned as a hive-partitioned dataset.
+    Each sync only pulls rows newer than the symbol's last ``dt_st``. In offline mode the
+    store never talks to Supabase and can be seeded from CSV fixtures.
+    """
+
+    def __init__(self, root=STORE_ROOT, supabase=None, offline=OFFLINE):
+        self.root = root
+        self.supabase = supabase
+        self.offline = offline or supabase is None
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, table, sym):
+        with self._locks_guard:
+            return self._locks.setdefault((table, sym), threading.Lock())
+
+    def _dir(self, table, sym=None):
+        path = os.path.join(self.root, f'period={table}')
+        return path if sym is None else os.path.join(path, f'sym={sym}')
+
+    def _path(self, table, sym):
+        return os.path.join(self._dir(table, sym), 'part.parquet')
+
+    @traced()
+    def read(self, table, sym) -> pd.DataFrame:
+        path = self._path(table, sym)
+        if not os.path.exists(path):
+            return decode([], table, FACT_COLUMNS)
+        df = pq.read_table(path, memory_map=True).to_pandas()
+        df.insert(0, 'sym', sym)
+        return df
+
+    def watermark(self, table, sym):
+        # Row-group statistics give max(dt_st) without reading the column
+        path = self._path(table, sym)
+        if not os.path.exists(path):
+            return None
+        meta = pq.ParquetFile(path, memory_map=True).metadata
+        col = meta.schema.to_arrow_schema().get_field_index('dt_st')
+        latest = None
+        for i in range(meta.num_row_groups):
+            stats = meta.row_group(i).column(col).statistics
+            if stats is not None and stats.has_min_max and (latest is None or stats.max > latest):
+                latest = stats.max
+        return pd.Timestamp(latest) if latest is not None else None
+
+    def write(self, table, sym, df):
+        os.makedirs(self._dir(table, sym), exist_ok=True)
+        path = self._path(table, sym)
+        tmp = f'{path}.tmp'
+        # sym lives in the partition path, not in the file
+        pq.write_table(pa.Table.from_pandas(df.drop(columns='sym'), preserve_index=False), tmp)
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    def append(self, table, sym, rows):
+        # rows are PostgREST-style dicts, decoded once into typed columns
+        new = decode(rows, table, FACT_COLUMNS)
+        if new.empty:
+            return 0
+        current = self.read(table, sym)
+        merged = pd.concat([current, new], ignore_index=True) if not current.empty else new
+        merged = merged.drop_duplicates('dt_st', keep='last').sort_values('dt_st', ignore_index=True)
+        self.write(table, sym, merged)
+        return len(new)
+
+    @traced()
+    def sync(self, table, sym):
+        if self.offline:
+            return 0
+        with self._lock(table, sym):
+            latest = self.watermark(table, sym)
+
+            def build():
+                query = self.supabase.table(table).select(', '.join(FACT_COLUMNS)).eq('sym', sym)
+                if latest is not None:
+                    query = query.gt('dt_st', latest.strftime('%Y-%m-%d'))
+                return query
+
+            # dt_st is unique within one symbol
+            return self.append(table, sym, fetch_all(build, 'dt_st'))
+
+    @traced()
+    def sync_many(self, table, symbols, chunk_size=SYNC_CHUNK_SIZE):
+        """Sync several symbols with one in_() query per chunk of symbols sharing a watermark.
+
+        Symbols synced together usually share their last dt_st, so a warm peer set is a
+        single query that returns nothing new, and cold symbols are pulled in one batch.
+        """
+        if self.offline:
+            return 0
+        groups = {}
+        for sym in dict.fromkeys(symbols):
+            groups.setdefault(self.watermark(table, sym), []).append(sym)
+        loaded = 0
+        for latest, group in groups.items():
+            for start in range(0, len(group), chunk_size):
+                chunk = group[start:start + chunk_size]
+
+                def build(chunk=chunk, latest=latest):
+                    query = self.supabase.table(table).select(', '.join(FACT_COLUMNS)).in_('sym', chunk)
+                    if latest is not None:
+                        query = query.gt('dt_st', latest.strftime('%Y-%m-%d'))
+                    return query
+
+                by_sym = {}
+                for row in fetch_all(build, ('sym', 'dt_st')):
+                    by_sym.setdefault(row['sym'], []).append(row)
+                for sym, rows in by_sym.items():
+                    with self._lock(table, sym):
+                        loaded += self.append(table, sym, rows)
+        return loaded
+
+    @traced()
+    def tail(self, table, symbols, since, sync=True, chunk_size=SYNC_CHUNK_SIZE) -> dict:
+        """Rows of ``table`` from ``since`` on, per symbol, without replicating whole histories.
+
+        Symbols already in the replica are synced and read locally. The others are read
+        from ``since`` with one in_() query per chunk and not stored, so a cold symbol
+        costs only its tail. ``since=None`` replicates and returns the full history.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        local = [sym for sym in symbols if since is None or self.watermark(table, sym) is not None]
+        if sync:
+            self.sync_many(table, local, chunk_size)
+        frames = {sym: self.read(table, sym) for sym in local}
+        if since is not None:
+            frames = {sym: df[df['dt_st'] >= since].reset_index(drop=True) for sym, df in frames.items()}
+        remote = [sym for sym in symbols if sym not in frames]
+        if not sync or self.offline:
+            return frames
+        for start in range(0, len(remote), chunk_size):
+            chunk = remote[start:start + chunk_size]
+
+            def build(chunk=chunk):
+                query = self.supabase.table(table).select(', '.join(FACT_COLUMNS)).in_('sym', chunk)
+                return query.gte('dt_st', since.strftime('%Y-%m-%d'))
+
+            rows = decode(fetch_all(build, ('sym', 'dt_st')), table, FACT_COLUMNS)
+            for sym, df in rows.groupby('sym', sort=False):
+                frames[sym] = df.reset_index(drop=True)
+        return frames
+
+    @traced()
+    def bars(self, table, symbols, sync=True, chunk_size=SYNC_CHUNK_SIZE) -> dict:
+        """Bars of any period per symbol; ``sync=False`` reads the replica only.
+
+        Daily bars are the replica itself. Weekly and monthly bars are the stored period
+        table continued past its last bar with a rollup of the daily tail, so they keep
+        the table's full history while only the newest periods are derived locally.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if sync:
+            self.sync_many(table, symbols, chunk_size)
+        stored = {sym: self.read(table, sym) for sym in symbols}
+        if table == DAILY_TABLE:
+            return stored
+        freq = PERIOD_FREQS[table]
+        starts = {sym: tail_start(df) for sym, df in stored.items()}
+        dated = [sym for sym in symbols if starts[sym] is not None]
+        # One tail query for the whole set, from the earliest symbol's last stored bar
+        daily = self.tail(DAILY_TABLE, dated, min(starts[sym] for sym in dated), sync, chunk_size) if dated else {}
+        undated = [sym for sym in symbols if starts[sym] is None]
+        if undated:
+            # Not in the period table at all: everything is rolled up from daily bars
+            daily.update(self.tail(DAILY_TABLE, undated, None, sync, chunk_size))
+        empty = decode([], DAILY_TABLE, FACT_COLUMNS)
+        return {sym: extend_bars(stored[sym], daily.get(sym, empty), freq) for sym in symbols}
+
+    def get(self, table, sym, sync=True) -> pd.DataFrame:
+        if sync:
+            self.sync(table, sym)
+        return self.read(table, sym)
+
+    @traced()
+    def scan(self, table, symbols=None, columns=None) -> pd.DataFrame:
+        """Read many symbols of one period at once for cross-symbol analytics."""
+        path = self._dir(table)
+        if not os.path.isdir(path):
+            return decode([], table, FACT_COLUMNS)
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        filter_ = ds.field('sym').isin(list(symbols)) if symbols is not None else None
+        return dataset.to_table(columns=columns, filter=filter_).to_pandas()
+
+    def load_fixtures(self, fixture_dir=FIXTURE_DIR):
+        # Expects one <table>.csv per fact table with the FACT_COLUMNS header
+        loaded = 0
+        for table in FACT_TABLES:
+            path = os.path.join(fixture_dir, f'{table}.csv')
+            if not os.path.exists(path):
+                continue
+            for sym, rows in pd.read_csv(path).groupby('sym'):
+                loaded += self.append(table, sym, rows.to_dict('records'))
+        return loaded
+
+
+@st.cache_resource(show_spinner=False)
+def get_fact_store() -> FactStore:
+    if OFFLINE:
+        store = FactStore(offline=True)
+        store.load_fixtures()
+        return store
+    return FactStore(supabase=get_client())
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+from functions.tracing import span
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+MAX_CACHE_ENTRIES = 512
+
+
+class FigureCache:
+    """LRU of serialized Plotly figures, bounded by entry count and total JSON size."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            if len(value) > self.max_bytes:
+                return
+            self.entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes or len(self.entries) > self.max_entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.size,
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> FigureCache:
+    return FigureCache()
+
+
+def data_version(*frames):
+    # Content hash of every input frame (values and index), so any data change misses
+    digest = hashlib.blake2b(digest_size=16)
+    for df in frames:
+        if df is None:
+            digest.update(b'none')
+            continue
+        digest.update(','.join(map(str, df.columns)).encode())
+        try:
+            digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        except TypeError:
+            # Nested list/dict cells (embeddings, trend JSON) are not hashable column-wise
+            digest.update(df.to_json(date_format='iso').encode())
+    return digest.hexdigest()
+
+
+def cached_figure(chart, symbol, period, metric, frames, build, **options):
+    """Return the figure for this chart from the shared cache, building it on a miss."""
+    key = (chart, symbol, period, metric, data_version(*frames), tuple(sorted(options.items())))
+    cache = get_figure_cache()
+    payload = cache.get(key)
+    if payload is not None:
+        with span(f'figure.{chart}.hit'):
+            return pio.from_json(payload)
+    with span(f'figure.{chart}.miss'):
+        fig = build()
+        cache.put(key, fig.to_json())
+    return fig
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.tracing import traced
+
+FILTER_COLUMNS = ['sec', 'ind', 'pst', 'pet', 'dyt']
+
+
+class FilterIndex:
+    """Categorical codes and packed bitmaps for the dim filter columns.
+
+    Built once per dim snapshot. A filter is an OR of the selected values' bitmaps
+    per column, ANDed across columns, so cost no longer depends on string scans.
+    Dropdown options keep the order values first appear in the frame, like unique().
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.df = df
+        self.n = len(df)
+        self.values = {}
+        self.bitmaps = {}
+        self.children = {}
+        codes = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            col_codes, uniques = pd.factorize(df[col], sort=False)
+            codes[col] = col_codes
+            self.values[col] = list(uniques)
+            # One packed bitmap per value: (n_values, ceil(n / 8)) uint8
+            hits = col_codes[None, :] == np.arange(len(uniques))[:, None]
+            self.bitmaps[col] = np.packbits(hits, axis=1)
+        if 'sec' in codes and 'ind' in codes:
+            # Precomputed cascade: sector -> industries in first-seen order
+            pairs = pd.DataFrame({'sec': codes['sec'], 'ind': codes['ind']})
+            pairs = pairs[(pairs['sec'] >= 0) & (pairs['ind'] >= 0)].drop_duplicates()
+            self.children = {
+                self.values['sec'][sec]: [self.values['ind'][i] for i in group['ind']]
+                for sec, group in pairs.groupby('sec', sort=False)
+            }
+        self._all = np.packbits(np.ones(self.n, dtype=bool))
+
+    def _column_bitmap(self, col, selected):
+        lookup = {value: i for i, value in enumerate(self.values[col])}
+        rows = [lookup[value] for value in selected if value in lookup]
+        if not rows:
+            return np.zeros_like(self._all)
+        return np.bitwise_or.reduce(self.bitmaps[col][rows], axis=0)
+
+    def bitmap(self, **selected):
+        result = self._all
+        for col, values in selected.items():
+            if values and col in self.bitmaps:
+                result = result & self._column_bitmap(col, values)
+        return result
+
+    def mask(self, **selected):
+        return np.unpackbits(self.bitmap(**selected), count=self.n).astype(bool)
+
+    def positions(self, **selected):
+        return np.flatnonzero(np.unpackbits(self.bitmap(**selected), count=self.n))
+
+    @traced()
+    def filter(self, **selected) -> pd.DataFrame:
+        if not any(selected.values()):
+            return self.df
+        return self.df.iloc[self.positions(**selected)]
+
+    def options(self, col, sec=None):
+        if col == 'ind' and sec:
+            seen = dict.fromkeys(ind for s in sec for ind in self.children.get(s, []))
+            return list(seen)
+        return list(self.values.get(col, []))
+
+
+# One index per dim snapshot; the version makes stale snapshots fall out of the cache
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_filter_index(version, _df) -> FilterIndex:
+    return FilterIndex(_df)
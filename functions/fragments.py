@@ -0,0 +1,54 @@
+import functools
+import streamlit as st
+from functions.tracing import current_trace, finish_trace, profiling, render_profiler, span, start_trace
+
+# fragment key -> session-state keys it reads; filled in by page_fragment()
+FRAGMENT_INPUTS = {}
+
+
+def page_fragment(key, inputs=()):
+    """``st.fragment`` registered under ``key`` together with the session-state keys it reads.
+
+    Widgets inside the fragment only rerun the fragment. When one of ``inputs`` changes
+    through publish(), exactly the fragments that declared it are rerun.
+
+    During a full rerun the fragment's span joins the page trace. A fragment-only rerun
+    has no page trace, so the fragment records its own and, when profiling, renders it.
+    """
+    FRAGMENT_INPUTS[key] = tuple(inputs)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            if current_trace() is not None:
+                with span(f'fragment.{key}'):
+                    return func(*args, **kwargs)
+            trace = start_trace(f'fragment.{key}')
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                finish_trace(trace)
+            if profiling():
+                render_profiler(trace)
+            return result
+        return st.fragment(run, key=key)
+    return decorator
+
+
+def dependents(*state_keys):
+    changed = set(state_keys)
+    return [key for key, inputs in FRAGMENT_INPUTS.items() if changed.intersection(inputs)]
+
+
+def publish(**values):
+    """Store fragment outputs from a widget callback and rerun only their readers.
+
+    Must be called from an on_change/on_click callback: keyed reruns are not allowed
+    from a script or fragment body. Unchanged values leave the default rerun in place.
+    """
+    changed = [name for name, value in values.items() if st.session_state.get(name) != value]
+    for name in changed:
+        st.session_state[name] = values[name]
+    targets = dependents(*changed)
+    if targets:
+        st.rerun(scope=targets)
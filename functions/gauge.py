@@ -1,101 +1,186 @@
+from functools import lru_cache
 import numpy as np
 import plotly.graph_objects as go
+from functions.figure_cache import cached_figure
+from functions.tracing import traced
 
-# Function to create the pie chart
-def create_pie_chart(df_dim_det, metric_type, metric_color):
-    # Define the background color and quadrant colors
-    plot_bgcolor = "rgba(255, 255, 255, 0)"
-    quadrant_colors = [plot_bgcolor, "lightgreen", "green", "orange", "red"]
-    quadrant_text = ["", "<b>Premium</b>", "<b>Fair</b>", "<b>Discount</b>", "<b>Sale</b>"]
-    n_quadrants = len(quadrant_colors) - 1
-
-    # Set the current value and limits
-    current_value = df_dim_det[f'{metric_type}n'].iloc[0]
-    min_value = 0
-    max_value = 180
-    hand_length = np.sqrt(2) / 4
+GAUGE_SUFFIXES = ['', 't', 'n', 'min', '2', '5', '8', 'max']
+GAUGE_METRICS = ('ps', 'pe', 'dy', 'ps')
+
+# Define the background color and quadrant colors
+plot_bgcolor = "rgba(255, 255, 255, 0)"
+quadrant_colors = [plot_bgcolor, "lightgreen", "green", "orange", "red"]
+quadrant_text = ["", "<b>Premium</b>", "<b>Fair</b>", "<b>Discount</b>", "<b>Sale</b>"]
+n_quadrants = len(quadrant_colors) - 1
+
+# Limits of the dial
+min_value = 0
+max_value = 180
+hand_length = np.sqrt(2) / 4
+
+# Fixed font sizes
+annotation_font_size = 24
+quadrant_label_font_size = 16
+
+# Static label slots (x, y, color, column suffix), in the dial's own 0..1 coordinates
+QUADRANT_LABELS = [
+    (1.13, 0.43, "lightgreen", 'max'),
+    (1, 0.8, "green", '8'),
+    (0.5, 0.95, "yellow", '5'),
+    (0, 0.8, "orange", '2'),
+    (-0.13, 0.43, "red", 'min'),
+]
+
+
+def _needle_end(current_value):
     hand_angle = np.pi * (1 - (max(min_value, min(max_value, current_value)) - min_value) / (max_value - min_value))
+    return float(0.5 + hand_length * np.cos(hand_angle)), float(0.5 + hand_length * np.sin(hand_angle))
+
+
+def _labels(df_dim_det, metric_type):
+    # Centre label followed by the five quadrant labels, in annotation order
+    row = df_dim_det.iloc[0]
+    texts = [f"<b>{metric_type} {row[f'{metric_type}t']}</b><br><b>{row[metric_type]}x</b>"]
+    texts += [f"<b>{row[f'{metric_type}{suffix}']}x</b>" for _, _, _, suffix in QUADRANT_LABELS]
+    return texts
+
+
+def _dial(x_domain=(0, 1), y_domain=(0, 1)):
+    """Pie, annotations and shapes of one dial placed inside the given paper domain."""
+    def px(x):
+        return x_domain[0] + x * (x_domain[1] - x_domain[0])
+
+    def py(y):
+        return y_domain[0] + y * (y_domain[1] - y_domain[0])
+
+    pie = go.Pie(
+        values=[0.5] + (np.ones(n_quadrants) / 2 / n_quadrants).tolist(),
+        rotation=90,
+        hole=0.5,
+        marker_colors=quadrant_colors,
+        text=quadrant_text,
+        textinfo="text",
+        hoverinfo="skip",
+        domain=dict(x=list(x_domain), y=list(y_domain)),
+    )
+    annotations = [
+        go.layout.Annotation(
+            text="",
+            x=px(0.5), xanchor="center", xref="paper",
+            y=py(0.23), yanchor="bottom", yref="paper",
+            showarrow=False,
+            font=dict(size=annotation_font_size)
+        )
+    ]
+    # Adding quadrant labels
+    for x, y, color, _ in QUADRANT_LABELS:
+        annotations.append(go.layout.Annotation(
+            text="",
+            x=px(x), y=py(y), xref="paper", yref="paper", xanchor="center", yanchor="bottom",
+            font=dict(size=quadrant_label_font_size, color=color),
+            showarrow=False
+        ))
+    shapes = [
+        go.layout.Shape(
+            type="circle", xref="paper", yref="paper",
+            x0=px(0.49), x1=px(0.51),
+            y0=py(0.49), y1=py(0.51),
+            fillcolor="yellow",
+            line_color="yellow",
+        ),
+        go.layout.Shape(
+            type="line", xref="paper", yref="paper",
+            x0=px(0.5), x1=px(0.5),
+            y0=py(0.5), y1=py(0.5),
+            line=dict(color="yellow", width=3)
+        )
+    ]
+    return pie, annotations, shapes, px, py
+
 
-    # Fixed font sizes
-    annotation_font_size = 24
-    quadrant_label_font_size = 16
-
-    fig = go.Figure(
-        data=[go.Pie(
-            values=[0.5] + (np.ones(n_quadrants) / 2 / n_quadrants).tolist(),
-            rotation=90,
-            hole=0.5,
-            marker_colors=quadrant_colors,
-            text=quadrant_text,
-            textinfo="text",
-            hoverinfo="skip",
-            #textfont=dict(color="black") 
-        )],
+@lru_cache(maxsize=8)
+def _template(metrics=None):
+    # The static dial(s) are built once per process; callers copy and patch them
+    if metrics is None:
+        pie, annotations, shapes, _, _ = _dial()
+        pies, width, height, margin = [pie], 350, 350, dict(b=0, t=40, l=50, r=50)
+    else:
+        pies, annotations, shapes = [], [], []
+        rows = (len(metrics) + 1) // 2
+        for i in range(len(metrics)):
+            r, c = divmod(i, 2)
+            # Leave room around each dial for the outer quadrant labels
+            x_domain = (c / 2 + 0.07, (c + 1) / 2 - 0.07)
+            y_domain = (1 - (r + 1) / rows + 0.02, 1 - r / rows - 0.08)
+            pie, cell_annotations, cell_shapes, _, _ = _dial(x_domain, y_domain)
+            pies.append(pie)
+            annotations += cell_annotations
+            shapes += cell_shapes
+        width, height, margin = 700, 350 * rows, dict(b=0, t=40, l=20, r=20)
+    return go.Figure(
+        data=pies,
         layout=go.Layout(
             showlegend=False,
-            margin=dict(b=0, t=40, l=50, r=50),
-            width=350,
-            height=350,
+            margin=margin,
+            width=width,
+            height=height,
             paper_bgcolor=plot_bgcolor,
-            annotations=[
-                go.layout.Annotation(
-                    text=f"<b>{metric_type} {df_dim_det[f'{metric_type}t'].iloc[0]}</b><br><b>{df_dim_det[metric_type].iloc[0]}x</b>",
-                    x=0.5, xanchor="center", xref="paper",
-                    y=0.23, yanchor="bottom", yref="paper",
-                    showarrow=False,
-                    font=dict(size=annotation_font_size)
-                ),
-
-                # Adding quadrant labels
-                go.layout.Annotation(
-                    text=f"<b>{df_dim_det[f'{metric_type}max'].iloc[0]}x</b>",
-                    x=1.13, y=0.43, xanchor="center", yanchor="bottom",
-                    font=dict(size=quadrant_label_font_size, color="lightgreen"),
-                    showarrow=False
-                ),
-                go.layout.Annotation(
-                    text=f"<b>{df_dim_det[f'{metric_type}8'].iloc[0]}x</b>",
-                    x=1, y=0.8, xanchor="center", yanchor="bottom",
-                    font=dict(size=quadrant_label_font_size, color="green"),
-                    showarrow=False
-                ),
-                go.layout.Annotation(
-                    text=f"<b>{df_dim_det[f'{metric_type}5'].iloc[0]}x</b>",
-                    x=0.5, y=0.95, xanchor="center", yanchor="bottom",
-                    font=dict(size=quadrant_label_font_size, color="yellow"),
-                    showarrow=False
-                ),
-                go.layout.Annotation(
-                    text=f"<b>{df_dim_det[f'{metric_type}2'].iloc[0]}x</b>",
-                    x=0, y=0.8, xanchor="center", yanchor="bottom",
-                    font=dict(size=quadrant_label_font_size, color="orange"),
-                    showarrow=False
-                ),
-                go.layout.Annotation(
-                    text=f"<b>{df_dim_det[f'{metric_type}min'].iloc[0]}x</b>",
-                    x=-0.13, y=0.43, xanchor="center", yanchor="bottom",
-                    font=dict(size=quadrant_label_font_size, color="red"),
-                    showarrow=False
-                )
-            ],
-            shapes=[
-                go.layout.Shape(
-                    type="circle",
-                    x0=0.49, x1=0.51,
-                    y0=0.49, y1=0.51,
-                    fillcolor="yellow",
-                    line_color="yellow",
-                ),
-                go.layout.Shape(
-                    type="line",
-                    x0=0.5, x1=0.5 + hand_length * np.cos(hand_angle),
-                    y0=0.5, y1=0.5 + hand_length * np.sin(hand_angle),
-                    line=dict(color="yellow", width=3)
-                )
-            ],
+            annotations=annotations,
+            shapes=shapes,
             xaxis=dict(visible=False),
             yaxis=dict(visible=False)
         )
     )
-    
-    return fig
\ No newline at end of file
+
+
+def _patch(fig, df_dim_det, metric_type, cell=0, domain=((0, 1), (0, 1))):
+    # Only the label texts and the needle end move between symbols and metrics
+    (x0, x1), (y0, y1) = domain
+    for offset, text in enumerate(_labels(df_dim_det, metric_type)):
+        fig.layout.annotations[cell * 6 + offset].text = text
+    nx, ny = _needle_end(df_dim_det[f'{metric_type}n'].iloc[0])
+    fig.layout.shapes[cell * 2 + 1].update(x1=x0 + nx * (x1 - x0), y1=y0 + ny * (y1 - y0))
+
+
+# Function to create the pie chart
+@traced()
+def build_pie_chart(df_dim_det, metric_type, metric_color):
+    fig = go.Figure(_template())
+    _patch(fig, df_dim_det, metric_type)
+    return fig
+
+
+@traced()
+def build_gauge_grid(df_dim_det, metrics=GAUGE_METRICS):
+    metrics = tuple(metrics)
+    fig = go.Figure(_template(metrics))
+    for cell, metric_type in enumerate(metrics):
+        pie = fig.data[cell]
+        _patch(fig, df_dim_det, metric_type, cell, (tuple(pie.domain.x), tuple(pie.domain.y)))
+    return fig
+
+
+def _key_frame(df_dim_det, metrics):
+    # Only the columns the gauges read go into the cache key
+    columns = list(dict.fromkeys(f'{m}{suffix}' for m in metrics for suffix in GAUGE_SUFFIXES))
+    return df_dim_det[columns].head(1)
+
+
+def _symbol(df_dim_det):
+    return df_dim_det['sym'].iloc[0] if 'sym' in df_dim_det.columns else None
+
+
+def create_pie_chart(df_dim_det, metric_type, metric_color):
+    return cached_figure(
+        'gauge', _symbol(df_dim_det), None, metric_type, [_key_frame(df_dim_det, [metric_type])],
+        lambda: build_pie_chart(df_dim_det, metric_type, metric_color),
+        color=metric_color,
+    )
+
+
+# All gauges as one subplot figure: a single chart payload instead of one per metric
+def create_gauge_grid(df_dim_det, metrics=GAUGE_METRICS):
+    return cached_figure(
+        'gauge_grid', _symbol(df_dim_det), None, ','.join(metrics), [_key_frame(df_dim_det, metrics)],
+        lambda: build_gauge_grid(df_dim_det, metrics),
+    )
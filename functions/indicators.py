@@ -0,0 +1,175 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.tracing import traced
+
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+RSI_PERIOD = 14
+# Output columns match stocksuperhero_tech_monthly so charts take either source
+TECH_COLUMNS = ['sym', 'dt_st', 'p', 'rsi', 'md', 'mds', 'mdh']
+MAX_SERIES = 512
+
+
+def _alpha(span):
+    return 2.0 / (span + 1.0)
+
+
+def _ewm(values, alpha, seed=None, by=None):
+    # Recursive EWMA (adjust=False); a seed continues a previous run from its last value
+    series = pd.Series(values, dtype='float64')
+    if seed is not None:
+        series = pd.concat([pd.Series([seed], dtype='float64'), series], ignore_index=True)
+        return series.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+    if by is not None:
+        grouped = series.groupby(by, sort=False).ewm(alpha=alpha, adjust=False).mean()
+        return grouped.reset_index(level=0, drop=True).sort_index().to_numpy()
+    return series.ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+@dataclass
+class IndicatorState:
+    """Last recursive values of one symbol's series, enough to extend it bar by bar."""
+    last_dt: pd.Timestamp
+    last_price: float
+    ema_fast: float
+    ema_slow: float
+    signal: float
+    avg_gain: float
+    avg_loss: float
+
+
+def _rsi(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        rsi = 100.0 - 100.0 / (1.0 + rs)
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+@traced()
+def compute_indicators(df_fact, price='p', return_state=False):
+    """MACD line/signal/histogram and Wilder RSI for one or many symbols.
+
+    Works on any period table; symbols are processed together with grouped EWMAs.
+    With ``return_state`` also returns {sym: IndicatorState} for update_indicators().
+    """
+    if df_fact.empty:
+        empty = pd.DataFrame(columns=TECH_COLUMNS)
+        return (empty, {}) if return_state else empty
+    df = df_fact[['sym', 'dt_st', price]].rename(columns={price: 'p'})
+    df = df.sort_values(['sym', 'dt_st'], kind='stable', ignore_index=True)
+    by = df['sym'].to_numpy()
+    p = df['p'].to_numpy(dtype='float64')
+
+    ema_fast = _ewm(p, _alpha(MACD_FAST), by=by)
+    ema_slow = _ewm(p, _alpha(MACD_SLOW), by=by)
+    md = ema_fast - ema_slow
+    mds = _ewm(md, _alpha(MACD_SIGNAL), by=by)
+
+    delta = df.groupby('sym', sort=False)['p'].diff().fillna(0.0).to_numpy()
+    avg_gain = _ewm(np.clip(delta, 0, None), 1.0 / RSI_PERIOD, by=by)
+    avg_loss = _ewm(np.clip(-delta, 0, None), 1.0 / RSI_PERIOD, by=by)
+
+    df['rsi'] = _rsi(avg_gain, avg_loss)
+    df['md'] = md
+    df['mds'] = mds
+    df['mdh'] = md - mds
+    if not return_state:
+        return df[TECH_COLUMNS]
+    last = df.groupby('sym', sort=False).tail(1).index
+    states = {
+        df['sym'].iat[i]: IndicatorState(
+            last_dt=df['dt_st'].iat[i], last_price=p[i],
+            ema_fast=ema_fast[i], ema_slow=ema_slow[i], signal=mds[i],
+            avg_gain=avg_gain[i], avg_loss=avg_loss[i],
+        )
+        for i in last
+    }
+    return df[TECH_COLUMNS], states
+
+
+@traced()
+def update_indicators(state: IndicatorState, sym, new_bars, price='p'):
+    """Extend one symbol's indicators with bars newer than state.last_dt.
+
+    Only the new tail is computed; returns (new rows, new state).
+    """
+    bars = new_bars[new_bars['dt_st'] > state.last_dt].sort_values('dt_st', kind='stable')
+    if bars.empty:
+        return pd.DataFrame(columns=TECH_COLUMNS), state
+    p = bars[price].to_numpy(dtype='float64')
+    delta = np.diff(p, prepend=state.last_price)
+
+    ema_fast = _ewm(p, _alpha(MACD_FAST), seed=state.ema_fast)
+    ema_slow = _ewm(p, _alpha(MACD_SLOW), seed=state.ema_slow)
+    md = ema_fast - ema_slow
+    mds = _ewm(md, _alpha(MACD_SIGNAL), seed=state.signal)
+    avg_gain = _ewm(np.clip(delta, 0, None), 1.0 / RSI_PERIOD, seed=state.avg_gain)
+    avg_loss = _ewm(np.clip(-delta, 0, None), 1.0 / RSI_PERIOD, seed=state.avg_loss)
+
+    rows = pd.DataFrame({
+        'sym': sym,
+        'dt_st': bars['dt_st'].to_numpy(),
+        'p': p,
+        'rsi': _rsi(avg_gain, avg_loss),
+        'md': md,
+        'mds': mds,
+        'mdh': md - mds,
+    }, columns=TECH_COLUMNS)
+    new_state = IndicatorState(
+        last_dt=bars['dt_st'].iat[-1], last_price=p[-1],
+        ema_fast=ema_fast[-1], ema_slow=ema_slow[-1], signal=mds[-1],
+        avg_gain=avg_gain[-1], avg_loss=avg_loss[-1],
+    )
+    return rows, new_state
+
+
+class IndicatorCache:
+    """Indicators per (symbol, period), extended with update_indicators as bars arrive.
+
+    The last bar of a series may still be open (today's daily bar, or a rolled-up week
+    or month), so the stored state stops at the bar before it. A longer series with the
+    same closed prefix only computes the bars after that state; anything else recomputes.
+    """
+
+    def __init__(self, max_series=MAX_SERIES):
+        self.max_series = max_series
+        # (sym, table) -> (closed rows, state at the last closed bar, number of closed bars)
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.full = 0
+        self.incremental = 0
+
+    @traced()
+    def get(self, table, bars, price='p') -> pd.DataFrame:
+        if len(bars) < 2:
+            return compute_indicators(bars, price)
+        sym = bars['sym'].iloc[0]
+        key = (sym, table)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is not None and len(bars) > entry[2] and bars['dt_st'].iloc[entry[2] - 1] == entry[1].last_dt:
+            closed, state, n = entry
+            rows, state = update_indicators(state, sym, bars.iloc[n:-1], price)
+            closed = pd.concat([closed, rows], ignore_index=True) if not rows.empty else closed
+            self.incremental += 1
+        else:
+            closed, states = compute_indicators(bars.iloc[:-1], price, return_state=True)
+            state = states[sym]
+            self.full += 1
+        with self._lock:
+            self.entries[key] = (closed, state, len(bars) - 1)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_series:
+                self.entries.popitem(last=False)
+        last, _ = update_indicators(state, sym, bars.iloc[-1:], price)
+        return pd.concat([closed, last], ignore_index=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_indicator_cache() -> IndicatorCache:
+    return IndicatorCache()
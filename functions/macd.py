@@ -1,14 +1,21 @@
 import plotly.graph_objects as go
 import streamlit as st
 import pandas as pd
+from functions.figure_cache import cached_figure
+from functions.render_backend import scatter_trace
+from functions.tracing import span, traced
+
+@traced()
+def build_macd_chart(df_tech, backend=None):
+    # MACD and signal lines switch to WebGL for long daily histories
+    Scatter = scatter_trace(len(df_tech), backend)
 
-def plot_macd_chart(df_tech):
     # Create the figure
     figuree = go.Figure()
 
     # Add the MACD line
      # Add the MACD line
-    figuree.add_trace(go.Scatter(
+    figuree.add_trace(Scatter(
         x=df_tech['dt_st'], 
         y=df_tech['md'],
         #mode='lines',
@@ -17,7 +24,7 @@ def plot_macd_chart(df_tech):
     ))
 
     # Add the Signal line
-    figuree.add_trace(go.Scatter(
+    figuree.add_trace(Scatter(
         x=df_tech['dt_st'], 
         y=df_tech['mds'],
         fill='tozeroy',  # Fill between the signal line and 0
@@ -71,5 +78,10 @@ def plot_macd_chart(df_tech):
         },
     )
 
-    st.plotly_chart(figuree, use_container_width=True)
+    return figuree
+
+def plot_macd_chart(df_tech, selected_stock_symbol=None, period=None, backend=None):
+    figuree = cached_figure('macd', selected_stock_symbol, period, 'macd', [df_tech], lambda: build_macd_chart(df_tech, backend), backend=backend)
+    with span('render.macd'):
+        st.plotly_chart(figuree, use_container_width=True)
 
@@ -1,8 +1,18 @@
 import plotly.graph_objects as go
 import streamlit as st
 import pandas as pd
+from functions.figure_cache import cached_figure
+from functions.downsample import downsample_frame, label_mask, point_budget
+from functions.render_backend import scatter_trace
+from functions.tracing import span, traced
+
+@traced()
+def build_metric_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color, max_points=None, downsample='lttb', backend=None):
+    # Bound the points sent to the browser; keep extremes and the rows the text labels sit on
+    if downsample:
+        keep = label_mask(df_fact['dt_st'], df_text_labels['dt_st'])
+        df_fact = downsample_frame(df_fact, [metric_type], max_points or point_budget(), method=downsample, keep=keep)
 
-def plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color):
     # Calculate min and max values for the selected metric
     min_p = df_fact[metric_type].min()
     max_p = df_fact[metric_type].max()
@@ -14,8 +24,8 @@ def plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type, met
     # Create a Plotly figure for the area chart
     fig = go.Figure()
 
-    # Add the area chart for stock prices with text labels
-    fig.add_trace(go.Scatter(
+    # Add the area chart for stock prices with text labels (WebGL for long series)
+    fig.add_trace(scatter_trace(len(df_fact), backend)(
         x=df_fact['dt_st'], 
         y=df_fact[metric_type],
         fill='tozeroy',  # Fill to the horizontal axis
@@ -26,6 +36,7 @@ def plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type, met
     ))
 
     # Adding text labels at specific x-axis values from df_text_labels
+    # (a handful of points, so the overlay always stays an SVG trace on top)
     fig.add_trace(go.Scatter(
         x=df_text_labels['dt_st'],  # Use the dt_st values from df_text_labels
         y=df_text_labels[f"{metric_type}_first"],  # Use ps values from df_text_labels for labels
@@ -108,5 +119,15 @@ def plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type, met
         modebar=dict(remove=["zoom", "pan", "select2d", "lasso2d", "autoScale", "resetScale", "zoomIn", "zoomOut", "resetViews"])
     )
 
+    return fig
+
+def plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color, period=None, max_points=None, downsample='lttb', backend=None):
+    fig = cached_figure(
+        'metric', selected_stock_symbol, period, metric_type, [df_fact, df_text_labels],
+        lambda: build_metric_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type, metric_color, max_points, downsample, backend),
+        color=metric_color, max_points=max_points, downsample=downsample, backend=backend,
+    )
+
     # Display the Plotly chart
-    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    with span('render.metric'):
+        st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
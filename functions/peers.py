@@ -0,0 +1,84 @@
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from functions.fact_store import get_fact_store
+from functions.tracing import traced
+
+PEER_CHUNK_SIZE = 50
+PEER_COLUMNS = ['sym', 'dt_st', 'p']
+PEER_TTL = 300
+
+
+@traced()
+def fetch_peer_history(symbols, fact_table, chunk_size=PEER_CHUNK_SIZE, columns=PEER_COLUMNS):
+    # Peers go through the local replica like the selected symbol: batched in_() syncs
+    # pull only rows past each symbol's watermark (plus the daily tail for weekly and
+    # monthly bars), then every symbol is a local Parquet read
+    bars = get_fact_store().bars(fact_table, symbols, chunk_size=chunk_size)
+    frames = [df[columns] for df in bars.values() if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+# Shared across reruns and sessions for a short while: the same peer set and period
+# is not re-synced on every detail rerun
+@st.cache_data(ttl=PEER_TTL, show_spinner=False)
+def load_peer_history(symbols: tuple, fact_table) -> pd.DataFrame:
+    return fetch_peer_history(list(symbols), fact_table)
+
+
+def align_series(df, value='p'):
+    """Pivot long (sym, dt_st, value) rows onto one shared date index, one column per symbol."""
+    if df.empty:
+        return pd.DataFrame()
+    # dt_st arrives as datetime64 from the schema decoder / local store
+    wide = df.pivot_table(index='dt_st', columns='sym', values=value, aggfunc='last').sort_index()
+    # Fill gaps between a symbol's own bars only, never before its first or after its last
+    return wide.ffill(limit_area='inside')
+
+
+def normalize_series(wide, base=100.0):
+    # Rebase each column to `base` at its first valid value
+    if wide.empty:
+        return wide
+    first = wide.bfill().iloc[0]
+    return wide.div(first.where(first != 0)) * base
+
+
+@traced()
+def plot_peer_chart(df_peers, selected_stock_symbol, value='p'):
+    wide = normalize_series(align_series(df_peers, value))
+    if wide.empty:
+        st.write("No peer history available.")
+        return
+    fig = go.Figure()
+    for sym in wide.columns:
+        selected = sym == selected_stock_symbol
+        fig.add_trace(go.Scatter(
+            x=wide.index,
+            y=wide[sym],
+            mode='lines',
+            name=sym,
+            line=dict(color='orange' if selected else 'rgba(135, 206, 250, 0.6)', width=3 if selected else 1),
+            hovertemplate=f'<b>{sym}</b><br><b>Date:</b> %{{x}}<br><b>Rebased:</b> %{{y:.1f}}<extra></extra>'
+        ))
+    fig.update_layout(
+        height=400,
+        margin=dict(l=0, r=0, t=0, b=0),
+        hovermode='closest',
+        dragmode=False,
+        showlegend=True,
+        yaxis={
+            'tickfont': {'size': 12, 'color': 'LightSteelBlue'},
+            'ticklabelposition': 'inside top',
+            'fixedrange': True,
+            'zeroline': False,
+        },
+        xaxis={
+            'tickfont': {'size': 12, 'color': 'LightSteelBlue'},
+            'tickcolor': 'LightSteelBlue',
+        },
+        modebar=dict(remove=["zoom", "pan", "select2d", "lasso2d", "autoScale", "resetScale", "zoomIn", "zoomOut", "resetViews"])
+    )
+    st.plotly_chart(fig, use_container_width=True)
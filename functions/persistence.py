@@ -0,0 +1,146 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+import streamlit as st
+from functions.db import execute, fetch_all, get_client
+
+# One row per change; schema in migrations/001_app_key_events.sql
+EVENTS_TABLE = 'app_key_events'
+# A login that replays this many events folds them into the app_keys snapshot
+COMPACT_AFTER = 20
+FLUSH_INTERVAL = 2.0
+MAX_BATCH = 200
+MAX_PENDING = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Buffers append-only event rows and inserts them in batches from a background thread.
+
+    Each login or watchlist change costs one small row, regardless of account age.
+    Failed batches are put back at the front and retried on the next flush.
+    """
+
+    def __init__(self, supabase, table=EVENTS_TABLE, interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.supabase = supabase
+        self.table = table
+        self.interval = interval
+        self.max_batch = max_batch
+        self.pending = []
+        self.flushed = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, row):
+        with self._lock:
+            self.pending.append(row)
+            if len(self.pending) > MAX_PENDING:
+                # Backend unreachable for a long time: drop the oldest instead of growing forever
+                del self.pending[:len(self.pending) - MAX_PENDING]
+            full = len(self.pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        while True:
+            with self._lock:
+                batch = self.pending[:self.max_batch]
+                del self.pending[:len(batch)]
+            if not batch:
+                return
+            try:
+                execute(self.supabase.table(self.table).insert(batch))
+                self.flushed += len(batch)
+            except Exception:
+                logger.warning("write-behind flush of %d events failed, retrying later", len(batch), exc_info=True)
+                self.failures += 1
+                with self._lock:
+                    self.pending[:0] = batch
+                return
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+
+@st.cache_resource(show_spinner=False)
+def get_event_queue() -> WriteBehindQueue:
+    return WriteBehindQueue(get_client())
+
+
+def _event(user_key, event, **payload):
+    return {
+        'key': user_key,
+        'event': event,
+        'payload': payload,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def record_login(user_key):
+    get_event_queue().enqueue(_event(user_key, 'login'))
+
+
+def record_watchlist_add(user_key, item):
+    get_event_queue().enqueue(_event(user_key, 'watchlist_add', **item))
+
+
+def record_watchlist_remove(user_key, symbol):
+    get_event_queue().enqueue(_event(user_key, 'watchlist_remove', symbol=symbol))
+
+
+def compact_watchlist(user_key, watchlist, through_id):
+    # The snapshot and the last event folded into it are written together, so any
+    # (watchlist, watchlist_event_id) pair in app_keys is consistent on its own
+    try:
+        execute(get_client().table('app_keys')
+                .update({'watchlist': watchlist, 'watchlist_event_id': through_id})
+                .eq('key', user_key))
+    except Exception:
+        logger.warning("watchlist compaction failed; events stay in the log", exc_info=True)
+
+
+def load_watchlist(user_key, snapshot=None, snapshot_event_id=None):
+    """Current watchlist: the app_keys snapshot with the events after it replayed on top.
+
+    Once a login replays COMPACT_AFTER events they are folded into the snapshot, so the
+    read cost stays bounded by the recent changes rather than the account's age. If the
+    event log cannot be read the snapshot alone is returned.
+    """
+    supabase = get_client()
+
+    def build():
+        query = (supabase.table(EVENTS_TABLE)
+                 .select('id, event, payload')
+                 .eq('key', user_key)
+                 .in_('event', ['watchlist_add', 'watchlist_remove']))
+        return query.gt('id', snapshot_event_id) if snapshot_event_id is not None else query
+
+    watchlist = list(snapshot or [])
+    try:
+        rows = fetch_all(build, 'id')
+    except Exception:
+        logger.warning("could not read %s, using the app_keys snapshot", EVENTS_TABLE, exc_info=True)
+        return watchlist
+    for row in rows:
+        payload = row['payload'] or {}
+        watchlist = [item for item in watchlist if item['symbol'] != payload.get('symbol')]
+        if row['event'] == 'watchlist_add':
+            watchlist.append(payload)
+    if len(rows) >= COMPACT_AFTER:
+        compact_watchlist(user_key, watchlist, rows[-1]['id'])
+    return watchlist
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from functions.detail import load_detail
+
+DETAIL_TTL = 60
+MAX_BUNDLES = 256
+PREFETCH_WORKERS = 2
+MAX_QUEUED = 32
+PREFETCH_TOP_N = 8
+# Sessions end without notice; an owner that has not prefetched for this long is dropped
+OWNER_TTL = 600
+
+
+class DetailPrefetcher:
+    """Shared LRU of detail bundles, warmed in the background for likely next selections.
+
+    ``get`` serves the selected symbol from the cache, joins a prefetch of it that is
+    already running, or loads it inline (cancelling one that is still queued). ``prefetch``
+    queues candidates on a small worker pool; queued work is cancelled when its owner's selection changes, and nothing new is queued
+    while MAX_QUEUED loads are pending, so speculation can never flood the backend.
+    Owners idle for owner_ttl are released, since Streamlit never says a session ended.
+    """
+
+    def __init__(self, loader=load_detail, max_workers=PREFETCH_WORKERS, max_entries=MAX_BUNDLES,
+                 ttl=DETAIL_TTL, max_queued=MAX_QUEUED, owner_ttl=OWNER_TTL):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_queued = max_queued
+        self.owner_ttl = owner_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self.bundles = OrderedDict()
+        self._inflight = {}
+        # owner -> (context, keys it queued, last prefetch); a new context cancels the old keys
+        self._owners = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.derived = 0
+        self.cancelled = 0
+        self.shed = 0
+
+    def _cached(self, key):
+        entry = self.bundles.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        self.bundles.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key, bundle):
+        # Partial bundles are shown once but never reused
+        if bundle.errors:
+            return
+        with self._lock:
+            self.bundles[key] = (bundle, time.monotonic())
+            self.bundles.move_to_end(key)
+            while len(self.bundles) > self.max_entries:
+                self.bundles.popitem(last=False)
+
+    def _load(self, key):
+        try:
+            bundle = self.loader(*key)
+            self._store(key, bundle)
+            return bundle
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _sibling(self, symbol, fact_table):
+        # A cached bundle of the same symbol at any period that can derive this one locally
+        for sym, table in list(self.bundles):
+            bundle = self._cached((sym, table)) if sym == symbol else None
+            if bundle is not None and bundle.derives(fact_table):
+                return bundle
+        return None
+
+    def get(self, symbol, fact_table):
+        key = (symbol, fact_table)
+        with self._lock:
+            bundle = self._cached(key)
+            future = self._inflight.get(key) if bundle is None else None
+            if bundle is not None:
+                self.hits += 1
+                return bundle
+            sibling = self._sibling(symbol, fact_table) if future is None else None
+            self.misses += 1
+        if sibling is not None:
+            # Period switch: read the other period from the local replica instead of refetching
+            bundle = sibling.for_period(fact_table)
+            self.derived += 1
+            self._store(key, bundle)
+            return bundle
+        if future is not None and (future.running() or future.done()):
+            try:
+                return future.result()
+            except Exception:
+                pass  # the speculative load failed; retry inline below
+        elif future is not None and future.cancel():
+            # Still queued behind other speculation: loading inline is faster than waiting
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    self._inflight.pop(key)
+            self.cancelled += 1
+        return self._load(key)
+
+    def prefetch(self, owner, context, symbols, fact_table, top_n=PREFETCH_TOP_N):
+        """Queue up to top_n symbols for ``owner``; a different ``context`` drops its earlier queue."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire_owners(now)
+            previous, queued, _ = self._owners.get(owner, (None, [], now))
+            if previous != context:
+                self._cancel(owner, queued)
+                queued = []
+            for sym in list(dict.fromkeys(symbols))[:top_n]:
+                key = (sym, fact_table)
+                # A sibling period is enough: get() derives it without a fetch
+                if key in queued or self._cached(key) is not None or key in self._inflight or self._sibling(sym, fact_table) is not None:
+                    continue
+                if len(self._inflight) >= self.max_queued:
+                    self.shed += 1
+                    continue
+                self._inflight[key] = self.executor.submit(self._load, key)
+                queued.append(key)
+                self.prefetched += 1
+            self._owners[owner] = (context, queued, now)
+
+    def _expire_owners(self, now):
+        for owner in [o for o, (_, _, seen) in self._owners.items() if now - seen > self.owner_ttl]:
+            _, queued, _ = self._owners.pop(owner)
+            self._cancel(owner, queued)
+
+    def _cancel(self, owner, keys):
+        # Only work that has not started can be cancelled, and only if no other owner queued it
+        wanted = {key for other, (_, queued, _) in self._owners.items() if other != owner for key in queued}
+        for key in keys:
+            future = self._inflight.get(key)
+            if key not in wanted and future is not None and future.cancel():
+                self._inflight.pop(key, None)
+                self.cancelled += 1
+
+    def release(self, owner):
+        with self._lock:
+            _, queued, _ = self._owners.pop(owner, (None, [], None))
+            self._cancel(owner, queued)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'prefetched': self.prefetched,
+            'derived': self.derived,
+            'cancelled': self.cancelled,
+            'shed': self.shed,
+            'bundles': len(self.bundles),
+            'inflight': len(self._inflight),
+            'owners': len(self._owners),
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher() -> DetailPrefetcher:
+    return DetailPrefetcher()
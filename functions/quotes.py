@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import pandas as pd
+import streamlit as st
+import yfinance as yf
+from functions.fact_store import FIXTURE_DIR, OFFLINE
+from functions.tracing import traced
+
+QUOTE_TTL = 60
+QUOTE_TIMEOUT = 5
+
+
+class YahooProvider:
+    """Last close for many symbols in one yfinance download."""
+
+    @traced()
+    def fetch(self, symbols):
+        symbols = list(symbols)
+        data = yf.download(symbols, period='5d', group_by='ticker', progress=False, threads=True, auto_adjust=False)
+        prices = {}
+        for sym in symbols:
+            try:
+                close = data[sym]['Close'] if isinstance(data.columns, pd.MultiIndex) else data['Close']
+            except KeyError:
+                continue
+            close = close.dropna()
+            if not close.empty:
+                prices[sym] = float(close.iloc[-1])
+        return prices
+
+
+class StaticProvider:
+    """Local stand-in: fixed prices, optionally with an artificial delay for tests."""
+
+    def __init__(self, prices, delay=0.0):
+        self.prices = dict(prices)
+        self.delay = delay
+        self.calls = 0
+
+    def fetch(self, symbols):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return {sym: self.prices[sym] for sym in symbols if sym in self.prices}
+
+    @classmethod
+    def from_fixtures(cls, fixture_dir=FIXTURE_DIR):
+        path = os.path.join(fixture_dir, 'fact_daily.csv')
+        if not os.path.exists(path):
+            return cls({})
+        df = pd.read_csv(path).sort_values('dt_st')
+        return cls(df.groupby('sym')['p'].last().to_dict())
+
+
+class QuoteService:
+    """TTL-cached quotes with batched fetches and request coalescing.
+
+    Symbols already being fetched by another session share that in-flight request;
+    all remaining misses of one call go to the provider as a single batch.
+    """
+
+    def __init__(self, provider, ttl=QUOTE_TTL, max_workers=4):
+        self.provider = provider
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quotes')
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, sym):
+        entry = self._cache.get(sym)
+        return entry is not None and time.monotonic() - entry[1] < self.ttl
+
+    def _fetch(self, symbols):
+        try:
+            prices = self.provider.fetch(symbols)
+            now = time.monotonic()
+            with self._lock:
+                for sym, price in prices.items():
+                    self._cache[sym] = (price, now)
+            return prices
+        finally:
+            with self._lock:
+                for sym in symbols:
+                    self._inflight.pop(sym, None)
+
+    def _request(self, symbols):
+        # Returns the futures covering every symbol that is neither cached nor fresh
+        futures = set()
+        with self._lock:
+            missing = []
+            for sym in dict.fromkeys(symbols):
+                if self._fresh(sym):
+                    continue
+                if sym in self._inflight:
+                    futures.add(self._inflight[sym])
+                else:
+                    missing.append(sym)
+            if missing:
+                future = self.executor.submit(self._fetch, missing)
+                for sym in missing:
+                    self._inflight[sym] = future
+                futures.add(future)
+        return futures
+
+    def prefetch(self, symbols):
+        """Warm the cache without waiting; safe to call on every rerun."""
+        self._request(symbols)
+
+    def peek(self, symbols):
+        # Cached prices only (stale ones included), never blocks
+        with self._lock:
+            return {sym: self._cache[sym][0] for sym in symbols if sym in self._cache}
+
+    def get_many(self, symbols, timeout=QUOTE_TIMEOUT):
+        futures = self._request(symbols)
+        if futures:
+            wait(futures, timeout=timeout)
+        return self.peek(symbols)
+
+    def get(self, symbol, timeout=QUOTE_TIMEOUT):
+        return self.get_many([symbol], timeout=timeout).get(symbol)
+
+
+@st.cache_resource(show_spinner=False)
+def get_quote_service() -> QuoteService:
+    provider = StaticProvider.from_fixtures() if OFFLINE else YahooProvider()
+    return QuoteService(provider)
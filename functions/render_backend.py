@@ -0,0 +1,25 @@
+import os
+import plotly.graph_objects as go
+
+# 'auto' switches to WebGL above WEBGL_THRESHOLD points per trace; 'svg' / 'webgl' force one
+DEFAULT_BACKEND = os.environ.get('STOCKSUPERHERO_RENDER_BACKEND', 'auto')
+# SVG paths stay smooth up to a few thousand points; past that the browser spends
+# more time laying out the DOM than WebGL needs to draw the whole series. Decided on the
+# points actually drawn: downsampled area/metric series (point_budget(), ~1200) stay SVG
+WEBGL_THRESHOLD = 2000
+BACKENDS = ('auto', 'svg', 'webgl')
+
+
+def resolve_backend(n_points, backend=None, threshold=WEBGL_THRESHOLD):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown render backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'auto':
+        return 'webgl' if n_points > threshold else 'svg'
+    return backend
+
+
+def scatter_trace(n_points, backend=None, threshold=WEBGL_THRESHOLD):
+    """go.Scatter or go.Scattergl for a series of n_points; both take the same arguments here
+    (lines, fill='tozeroy', text modes and hover templates)."""
+    return go.Scattergl if resolve_backend(n_points, backend, threshold) == 'webgl' else go.Scatter
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+DAILY_TABLE = 'fact_daily'
+# Stored period tables -> pandas period frequency of their bars
+PERIOD_FREQS = {'fact': 'W-FRI', 'fact_monthly': 'M'}
+# How each column is aggregated over one period's daily bars; unlisted columns take the last bar.
+# Prices and fundamentals are point-in-time at the period close, the target-price
+# bands are smoothed levels, so they average over the period.
+ROLLUP_RULES = {
+    'p': 'last',
+    'ps': 'last', 'sps': 'last',
+    'pe': 'last', 'eps': 'last',
+    'dy': 'last', 'd': 'last',
+    'high_tp': 'mean', 'mid_tp': 'mean', 'low_tp': 'mean',
+}
+# The stored weekly and monthly tables hold each period's last daily row as is
+STORED_RULES = {col: 'last' for col in ROLLUP_RULES}
+
+
+def _bucket_starts(daily, freq):
+    # A new bar starts wherever the period (or the symbol) changes between consecutive rows
+    ordinals = pd.DatetimeIndex(daily['dt_st']).to_period(freq).asi8
+    change = np.empty(len(daily), dtype=bool)
+    change[0] = True
+    change[1:] = ordinals[1:] != ordinals[:-1]
+    if 'sym' in daily.columns:
+        codes = pd.factorize(daily['sym'])[0]
+        change[1:] |= codes[1:] != codes[:-1]
+    return np.flatnonzero(change)
+
+
+def rollup(daily, freq, rules=ROLLUP_RULES) -> pd.DataFrame:
+    """One bar per period from daily bars sorted by (sym, dt_st), fully vectorized.
+
+    Each bar is stamped with the dt_st of its last daily bar, so it sits on a real
+    trading day like the rows of the stored weekly and monthly tables.
+    """
+    if daily.empty:
+        return daily.iloc[0:0].reset_index(drop=True)
+    starts = _bucket_starts(daily, freq)
+    ends = np.append(starts[1:], len(daily)) - 1
+    bars = daily.iloc[ends].reset_index(drop=True)
+    for col, rule in rules.items():
+        if col not in bars.columns or rule == 'last':
+            continue
+        if rule != 'mean':
+            raise ValueError(f"unknown rollup rule {rule!r} for {col}")
+        values = daily[col].to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bars[col] = (sums / counts).astype(bars[col].dtype)
+    return bars
+
+
+def tail_start(bars):
+    """Daily rows from here on continue stored period bars: their last bar's date."""
+    if bars.empty:
+        return None
+    return bars['dt_st'].iloc[-1]
+
+
+def extend_bars(bars, daily, freq, rules=STORED_RULES) -> pd.DataFrame:
+    """Stored period bars of one symbol continued with a rollup of its daily tail.
+
+    The period tables keep the long history; daily rows only roll up what comes after
+    it, with the tables' own rule so both halves of the series agree. Daily rows in
+    the period of the last stored bar mean it was written while that period was still
+    open, and only then is it replaced.
+    """
+    if bars.empty:
+        return rollup(daily, freq, rules)
+    last_dt = bars['dt_st'].iloc[-1]
+    tail = daily[daily['dt_st'] > last_dt]
+    if tail.empty:
+        return bars
+    if pd.Period(tail['dt_st'].iloc[0], freq) == pd.Period(last_dt, freq):
+        bars = bars.iloc[:-1]
+    return pd.concat([bars, rollup(tail, freq, rules)], ignore_index=True)
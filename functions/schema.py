@@ -0,0 +1,115 @@
+import json
+import numpy as np
+import pandas as pd
+from functions.tracing import traced
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; the stdlib decoder gives the same result, slower
+    _loads = json.loads
+
+# Declared column types for every table the app reads. Columns not listed stay as object.
+_FACT = {
+    'sym': 'string', 'dt_st': 'datetime',
+    'p': 'float64', 'high_tp': 'float64', 'mid_tp': 'float64', 'low_tp': 'float64',
+    'ps': 'float32', 'sps': 'float64', 'pe': 'float32', 'eps': 'float64', 'dy': 'float32', 'd': 'float64',
+}
+_GAUGE = {f'{m}{suffix}': 'float64' for m in ('ps', 'pe', 'dy') for suffix in ('', 'min', '2', '5', '8', 'max', 'n')}
+SCHEMAS = {
+    'dim': {
+        'sym': 'string', 'cn': 'string', 'ex': 'category',
+        'ind': 'category', 'sec': 'category', 'pst': 'category', 'pet': 'category', 'dyt': 'category',
+        'ps': 'float64', 'pe': 'float64', 'dy': 'float64', 'updated_at': 'datetime',
+    },
+    'dim_det': {
+        'sym': 'string', 'cn': 'string', 'ind': 'string', 'sec': 'string', 'ex': 'string',
+        'pst': 'string', 'pet': 'string', 'dyt': 'string',
+        **_GAUGE, 'sps': 'float64', 'eps': 'float64', 'd': 'float64',
+        'trend_json_ss': 'json', 'v_ps': 'vector', 'v_rsi': 'vector',
+        'v_ps_string': 'string', 'v_rsi_string': 'string',
+    },
+    'fact': _FACT,
+    'fact_daily': _FACT,
+    'fact_monthly': _FACT,
+    'stocksuperhero_tech_monthly': {
+        'sym': 'string', 'dt_st': 'datetime',
+        'p': 'float64', 'rsi': 'float32', 'md': 'float32', 'mds': 'float32', 'mdh': 'float32',
+    },
+}
+
+
+def _numeric(values, dtype):
+    try:
+        return np.fromiter((np.nan if v is None else v for v in values), dtype=dtype, count=len(values))
+    except (TypeError, ValueError):
+        # numeric columns may arrive as strings; let pandas coerce them
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=dtype)
+
+
+def _json(value):
+    return _loads(value) if isinstance(value, (str, bytes)) else value
+
+
+def _objects(values):
+    # Element-wise fill keeps list cells (vectors, JSON arrays) from becoming a 2-D array
+    out = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        out[i] = value
+    return out
+
+
+def _vector(value):
+    if value is None:
+        return None
+    return np.asarray(_json(value), dtype=np.float32)
+
+
+def decode_column(values, kind):
+    if kind in ('float32', 'float64'):
+        return _numeric(values, kind)
+    if kind == 'datetime':
+        return pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601', utc=False).to_numpy()
+    if kind == 'category':
+        return pd.Categorical(values)
+    if kind == 'string':
+        return pd.array(values, dtype='string')
+    if kind == 'json':
+        return _objects([_json(v) for v in values])
+    if kind == 'vector':
+        return _objects([_vector(v) for v in values])
+    return _objects(values)
+
+
+@traced()
+def decode(rows, table, columns=None) -> pd.DataFrame:
+    """Build a typed DataFrame straight from PostgREST rows, one pass per column.
+
+    Every column is converted exactly once here, so downstream code never re-parses
+    dates or JSON. ``columns`` fixes the output columns for empty responses.
+    """
+    schema = SCHEMAS.get(table, {})
+    if columns is None:
+        columns = list(rows[0].keys()) if rows else list(schema)
+    data = {}
+    for col in columns:
+        values = [row.get(col) for row in rows]
+        data[col] = decode_column(values, schema.get(col))
+    return pd.DataFrame(data, columns=columns)
+
+
+# Columns every trend label frame carries, even when a symbol has no trend data
+TREND_LABEL_COLUMNS = ['dt_st', 'ps_first', 'pe_first', 'dy_first']
+
+
+def decode_trend_labels(value) -> pd.DataFrame:
+    # trend_json_ss -> one row per label, dt_st parsed once; null/empty gives a typed empty frame
+    records = _json(value) if isinstance(value, (list, dict)) or value else None
+    df = pd.json_normalize(records or [])
+    for col in TREND_LABEL_COLUMNS:
+        if col not in df.columns:
+            df[col] = pd.Series(dtype='float64')
+    df['dt_st'] = pd.to_datetime(df['dt_st'], format='ISO8601')
+    for col in TREND_LABEL_COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.tracing import traced
+
+RANK_METRICS = ['ps', 'pe', 'dy']
+RANK_GROUPS = ['sec', 'ind']
+# A missing rank counts as the group median in the composite score
+NEUTRAL_RANK = 0.5
+
+
+def relative_value_weights(group='sec'):
+    # Cheap on P/S and P/E and a high yield relative to peers score best
+    return {f'ps_{group}_pct': -1.0, f'pe_{group}_pct': -1.0, f'dy_{group}_pct': 1.0}
+
+
+DEFAULT_WEIGHTS = relative_value_weights('sec')
+
+
+class Screener:
+    """Numeric range predicates and peer-relative percentile ranks over a dim snapshot.
+
+    Built once per snapshot: every metric is held as a float64 array next to its
+    percentile rank within each sector and industry (``ps_sec_pct``, ``pe_ind_pct``, ...).
+    A screen is a NumPy boolean mask per predicate, ANDed, and only the top ``limit``
+    rows by composite score are fully sorted.
+    """
+
+    def __init__(self, df, metrics=RANK_METRICS, groups=RANK_GROUPS):
+        self.df = df
+        self.n = len(df)
+        self.columns = {}
+        self.rank_columns = []
+        for metric in metrics:
+            if metric not in df.columns:
+                continue
+            values = pd.to_numeric(df[metric], errors='coerce').astype('float64')
+            self.columns[metric] = values.to_numpy()
+            for group in groups:
+                if group not in df.columns:
+                    continue
+                # One vectorized groupby rank per (metric, group); NaN metrics stay unranked
+                ranks = values.groupby(df[group], observed=True, sort=False).rank(pct=True)
+                name = f'{metric}_{group}_pct'
+                self.columns[name] = ranks.to_numpy(dtype='float64', na_value=np.nan)
+                self.rank_columns.append(name)
+
+    def mask(self, base=None, **ranges):
+        """``ranges`` maps a column to (low, high), either bound None; rows with NaN never match."""
+        result = np.ones(self.n, dtype=bool) if base is None else np.array(base, dtype=bool)
+        for col, (low, high) in ranges.items():
+            values = self.columns[col]
+            if low is not None:
+                result &= values >= low
+            if high is not None:
+                result &= values <= high
+        return result
+
+    def score(self, weights=None):
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        total = np.zeros(self.n)
+        for col, weight in weights.items():
+            total += weight * np.nan_to_num(self.columns[col], nan=NEUTRAL_RANK)
+        return total
+
+    @traced()
+    def screen(self, base=None, ranges=None, weights=None, limit=None) -> pd.DataFrame:
+        """Matching rows with their ranks and ``score``, best first.
+
+        ``base`` is an optional row mask (e.g. FilterIndex.mask) ANDed with the ranges.
+        """
+        positions = np.flatnonzero(self.mask(base, **(ranges or {})))
+        scores = self.score(weights)[positions]
+        if limit is not None and limit < len(positions):
+            # Partial sort: O(n) selection of the top rows, then sort only those
+            top = np.argpartition(-scores, limit - 1)[:limit] if limit > 0 else np.array([], dtype=np.intp)
+        else:
+            top = np.arange(len(positions))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        rows = positions[top]
+        ranks = {col: self.columns[col][rows] for col in self.rank_columns}
+        return self.df.iloc[rows].assign(**ranks, score=scores[top])
+
+
+# One screener per dim snapshot, keyed like the filter index
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_screener(version, _df) -> Screener:
+    return Screener(_df)
@@ -0,0 +1,239 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+# Aggregates are exported here every EXPORT_INTERVAL seconds: *.prom -> Prometheus textfile, else JSON
+EXPORT_PATH = os.environ.get('STOCKSUPERHERO_TRACE_EXPORT')
+EXPORT_INTERVAL = 30
+SAMPLES_PER_SPAN = 2048
+PERCENTILES = (50, 90, 99)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+    depth: int
+    thread: str
+    attrs: dict = field(default_factory=dict)
+
+
+class Trace:
+    """Every span recorded during one rerun, including those from worker threads."""
+
+    def __init__(self, name='rerun'):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+        return self
+
+    def frame(self):
+        with self._lock:
+            spans = list(self.spans)
+        return pd.DataFrame({
+            'name': [s.name for s in spans],
+            'start_ms': [(s.start - self.start) * 1000 for s in spans],
+            'duration_ms': [s.duration * 1000 for s in spans],
+            'depth': [s.depth for s in spans],
+            'thread': [s.thread for s in spans],
+        }).sort_values('start_ms', ignore_index=True)
+
+
+class SpanStats:
+    """Per-span-name counters plus a bounded window of recent durations for percentiles."""
+
+    def __init__(self, samples=SAMPLES_PER_SPAN):
+        self.samples = samples
+        self.counts = defaultdict(int)
+        self.totals = defaultdict(float)
+        self.errors = defaultdict(int)
+        self.recent = defaultdict(lambda: deque(maxlen=self.samples))
+        self.last_export = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, name, duration, error=False):
+        with self._lock:
+            self.counts[name] += 1
+            self.totals[name] += duration
+            self.recent[name].append(duration)
+            if error:
+                self.errors[name] += 1
+
+    def summary(self):
+        with self._lock:
+            names = list(self.counts)
+            recent = {name: np.fromiter(self.recent[name], dtype='float64') for name in names}
+            out = {}
+            for name in names:
+                values = np.percentile(recent[name], PERCENTILES) if len(recent[name]) else [0.0] * len(PERCENTILES)
+                out[name] = {
+                    'count': self.counts[name],
+                    'errors': self.errors[name],
+                    'total_s': self.totals[name],
+                    **{f'p{p}_ms': float(v) * 1000 for p, v in zip(PERCENTILES, values)},
+                }
+        return out
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self.totals.clear()
+            self.errors.clear()
+            self.recent.clear()
+
+    def to_prometheus(self):
+        summary = sorted(self.summary().items())
+        labels = {name: name.replace('\\', '\\\\').replace('"', '\\"') for name, _ in summary}
+        # Each metric family must be contiguous in the textfile format
+        lines = ['# TYPE stocksuperhero_span_seconds summary']
+        for name, row in summary:
+            for p in PERCENTILES:
+                lines.append(f'stocksuperhero_span_seconds{{span="{labels[name]}",quantile="{p / 100}"}} {row[f"p{p}_ms"] / 1000:.6f}')
+            lines.append(f'stocksuperhero_span_seconds_sum{{span="{labels[name]}"}} {row["total_s"]:.6f}')
+            lines.append(f'stocksuperhero_span_seconds_count{{span="{labels[name]}"}} {row["count"]}')
+        lines.append('# TYPE stocksuperhero_span_errors_total counter')
+        for name, row in summary:
+            lines.append(f'stocksuperhero_span_errors_total{{span="{labels[name]}"}} {row["errors"]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        if path.endswith('.prom'):
+            payload = self.to_prometheus()
+        else:
+            payload = json.dumps({'generated_at': time.time(), 'spans': self.summary()}, indent=2)
+        # Write then rename so scrapers never read a half-written file
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        self.last_export = time.monotonic()
+
+    def maybe_export(self, path=EXPORT_PATH, interval=EXPORT_INTERVAL):
+        if path and time.monotonic() - self.last_export >= interval:
+            try:
+                self.export(path)
+            except OSError:
+                logger.warning("trace export to %s failed", path, exc_info=True)
+
+
+# Process-wide aggregates; kept at module level so recording a span stays a few dict operations
+STATS = SpanStats()
+_trace = contextvars.ContextVar('trace', default=None)
+_depth = contextvars.ContextVar('trace_depth', default=0)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block. Always feeds STATS; also lands in the current rerun's trace if there is one."""
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _depth.reset(token)
+        STATS.record(name, duration, error)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add(Span(name, start, duration, depth, threading.current_thread().name, attrs))
+
+
+def traced(name=None):
+    """Decorator form of span(); the span name defaults to module.function."""
+    def decorator(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(func):
+    # Run func in a copy of the caller's context, so spans in worker threads join its trace
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def current_trace():
+    return _trace.get()
+
+
+def profiling() -> bool:
+    # ?profile=1 in the URL shows the waterfall of each rerun
+    return st.query_params.get('profile') == '1'
+
+
+def start_trace(name='rerun') -> Trace:
+    trace = Trace(name)
+    _trace.set(trace)
+    _depth.set(0)
+    return trace
+
+
+def finish_trace(trace):
+    _trace.set(None)
+    trace.finish()
+    STATS.record(trace.name, trace.duration)
+    STATS.maybe_export()
+    return trace
+
+
+def render_profiler(trace):
+    """Waterfall of the given rerun plus the process-wide percentiles."""
+    df = trace.frame()
+    with st.expander(f"Profiler · {trace.name} · {(trace.duration or 0) * 1000:.0f} ms", expanded=False):
+        if df.empty:
+            st.write("No spans recorded.")
+        else:
+            labels = [f"{'· ' * depth}{name}" for name, depth in zip(df['name'], df['depth'])]
+            # Positional rows: repeated span names must not collapse into one bar
+            fig = go.Figure(go.Bar(
+                y=list(range(len(df))),
+                x=df['duration_ms'],
+                base=df['start_ms'],
+                orientation='h',
+                customdata=df['thread'],
+                text=labels,
+                textposition='none',
+                hovertemplate='%{text}<br>start %{base:.1f} ms<br>%{x:.1f} ms<br>%{customdata}<extra></extra>',
+            ))
+            fig.update_layout(
+                height=max(200, 18 * len(df) + 60),
+                margin=dict(l=0, r=0, t=10, b=0),
+                xaxis_title='ms since rerun start',
+                yaxis=dict(autorange='reversed', tickmode='array', tickvals=list(range(len(df))), ticktext=labels),
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        summary = pd.DataFrame.from_dict(STATS.summary(), orient='index')
+        if not summary.empty:
+            st.dataframe(summary.sort_values('total_s', ascending=False), use_container_width=True)
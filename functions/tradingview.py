@@ -1,7 +1,9 @@
 import streamlit as st
 import streamlit.components.v1 as components
+from functions.tracing import traced
 
 # Function to display the TradingView widget for a single stock (simplified version)
+@traced()
 def show_single_stock_widget(symbol, width=350, is_transparent=True, color_theme="dark", locale="en"):
     css = """
     <style>
@@ -38,6 +40,7 @@ def show_single_stock_widget(symbol, width=350, is_transparent=True, color_theme
 
 
 # Function to display the TradingView ticker tape widget
+@traced()
 def show_ticker_tape(is_transparent=True, color_theme="dark", locale="en"):
     ticker_code = f"""
     <div style="margin-right: -50px; pointer-events: none;">
@@ -1,33 +1,192 @@
+import json
+import logging
+import numpy as np
 import pandas as pd
 import streamlit as st
-from supabase import create_client, Client
+from supabase import Client
+from functions.db import execute, fetch_all, get_client
+from functions.tracing import traced
 
-# Initialize Supabase client
+logger = logging.getLogger(__name__)
+
+# Columns returned by the local engine: the matched symbol and its cosine similarities
+RESULT_COLUMNS = ['sym', 'ps_similarity', 'rsi_similarity', 'similarity']
+IVF_MIN_ROWS = 20000
+
+# Shared process-wide Supabase client
 def init_supabase() -> Client:
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    supabase: Client = create_client(url, key)
-    return supabase
+    return get_client()
 
 # Function to call the match_vectors RPC
+@traced()
 def get_supabase_dataframe(input_v_ps, input_v_rsi, match_count=100):
     supabase: Client = init_supabase()
 
     # RPC call to the match_vectors function
-    response = supabase.rpc("match_vectors", {
+    response = execute(supabase.rpc("match_vectors", {
         "query_v_ps": input_v_ps,
         "query_v_rsi": input_v_rsi,
         "match_count": match_count,
-    }).execute()
-    
+    }))
+
     if not response.data:
-        print("Error: No data found")
-    else:
-        # Process the response data
-        print(response.data)
-    
+        logger.warning("match_vectors returned no rows")
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
     # Convert response data to a DataFrame
-    data = response.data
-    df = pd.DataFrame(data)
+    return pd.DataFrame(response.data)
+
+
+# pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings
+def parse_vector(value):
+    if value is None or isinstance(value, float):
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def _top_k(scores, k):
+    # argpartition keeps the selection linear, only the k winners get sorted
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class VectorIndex:
+    """In-process cosine similarity over every symbol's v_ps and v_rsi embeddings.
+
+    Both matrices are stored L2-normalised as contiguous float32 so a query is a
+    single matrix product per vector. For large universes an IVF partitioning
+    (k-means over the combined vector) restricts the scan to the nearest lists.
+    """
+
+    def __init__(self, symbols, v_ps, v_rsi, n_lists=None, n_probe=8, seed=0):
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.v_ps = _normalize_rows(np.asarray(v_ps, dtype=np.float32))
+        self.v_rsi = _normalize_rows(np.asarray(v_rsi, dtype=np.float32))
+        self.positions = {sym: i for i, sym in enumerate(self.symbols)}
+        self.n_probe = n_probe
+        self.centroids = None
+        self.lists = None
+        if n_lists is None and len(self.symbols) >= IVF_MIN_ROWS:
+            n_lists = int(np.sqrt(len(self.symbols)))
+        if n_lists:
+            self._build_ivf(n_lists, seed)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        # Drop symbols with missing or ragged embeddings instead of failing the whole load
+        v_ps = df['v_ps'].map(parse_vector)
+        v_rsi = df['v_rsi'].map(parse_vector)
+        valid = v_ps.notna() & v_rsi.notna()
+        if valid.any():
+            dim_ps = v_ps[valid].map(len).mode().iloc[0]
+            dim_rsi = v_rsi[valid].map(len).mode().iloc[0]
+            valid &= v_ps.map(lambda v: v is not None and len(v) == dim_ps)
+            valid &= v_rsi.map(lambda v: v is not None and len(v) == dim_rsi)
+        if not valid.any():
+            return cls([], np.empty((0, 1)), np.empty((0, 1)), **kwargs)
+        return cls(
+            df.loc[valid, 'sym'].to_numpy(),
+            np.stack(v_ps[valid].to_numpy()),
+            np.stack(v_rsi[valid].to_numpy()),
+            **kwargs
+        )
+
+    def _combined(self, ps_weight, rsi_weight):
+        return np.hstack([self.v_ps * np.sqrt(ps_weight), self.v_rsi * np.sqrt(rsi_weight)])
+
+    def _build_ivf(self, n_lists, seed, n_iter=10):
+        # Plain Lloyd's k-means on the equally weighted combined vector
+        data = self._combined(0.5, 0.5)
+        rng = np.random.default_rng(seed)
+        n_lists = min(n_lists, len(data))
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = data[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+        assign = np.argmax(data @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assign == c) for c in range(n_lists)]
+
+    def _candidates(self, q_ps, q_rsi):
+        if self.centroids is None:
+            return None
+        q = np.hstack([q_ps, q_rsi]) * np.sqrt(0.5)
+        probe = _top_k(q @ self.centroids.T, self.n_probe)
+        return [np.unique(np.concatenate([self.lists[c] for c in row])) for row in probe]
+
+    def query(self, q_ps, q_rsi, k=100, ps_weight=0.5, rsi_weight=0.5):
+        """Return top-k (positions, ps, rsi, combined) scores for a batch of queries."""
+        q_ps = _normalize_rows(np.atleast_2d(np.asarray(q_ps, dtype=np.float32)))
+        q_rsi = _normalize_rows(np.atleast_2d(np.asarray(q_rsi, dtype=np.float32)))
+        candidates = self._candidates(q_ps, q_rsi)
+        results = []
+        if candidates is None:
+            # Exact search: one batched matmul per vector for the whole query batch
+            ps_scores = q_ps @ self.v_ps.T
+            rsi_scores = q_rsi @ self.v_rsi.T
+            scores = ps_weight * ps_scores + rsi_weight * rsi_scores
+            top = _top_k(scores, k)
+            for row, idx in enumerate(top):
+                results.append((idx, ps_scores[row, idx], rsi_scores[row, idx], scores[row, idx]))
+            return results
+        for row, cand in enumerate(candidates):
+            ps_scores = self.v_ps[cand] @ q_ps[row]
+            rsi_scores = self.v_rsi[cand] @ q_rsi[row]
+            scores = ps_weight * ps_scores + rsi_weight * rsi_scores
+            top = _top_k(scores, k)
+            results.append((cand[top], ps_scores[top], rsi_scores[top], scores[top]))
+        return results
+
+    @traced()
+    def search(self, input_v_ps, input_v_rsi, match_count=100, ps_weight=0.5, rsi_weight=0.5):
+        if len(self) == 0:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        idx, ps, rsi, score = self.query(
+            parse_vector(input_v_ps), parse_vector(input_v_rsi),
+            k=match_count, ps_weight=ps_weight, rsi_weight=rsi_weight
+        )[0]
+        return pd.DataFrame({
+            'sym': self.symbols[idx],
+            'ps_similarity': ps,
+            'rsi_similarity': rsi,
+            'similarity': score,
+        }, columns=RESULT_COLUMNS)
+
+    @traced()
+    def search_symbol(self, symbol, match_count=100, ps_weight=0.5, rsi_weight=0.5):
+        pos = self.positions.get(symbol)
+        if pos is None:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        return self.search(self.v_ps[pos], self.v_rsi[pos], match_count, ps_weight, rsi_weight)
+
+
+@traced()
+def fetch_vectors(supabase: Client):
+    rows = fetch_all(lambda: supabase.table('dim_det').select('sym, v_ps, v_rsi'), 'sym')
+    return pd.DataFrame(rows, columns=['sym', 'v_ps', 'v_rsi'])
+
+
+# Loaded once per process and shared by every session
+@st.cache_resource(ttl=3600, show_spinner=False)
+def get_vector_index() -> VectorIndex:
+    return VectorIndex.from_frame(fetch_vectors(init_supabase()))
 
-    return df
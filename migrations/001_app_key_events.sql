@@ -0,0 +1,15 @@
+-- Append-only login and watchlist events, inserted in batches by functions/persistence.py.
+-- The id gives a total order for replay and marks how far app_keys.watchlist is compacted.
+create table if not exists app_key_events (
+    id bigserial primary key,
+    key text not null,
+    event text not null,
+    payload jsonb not null default '{}'::jsonb,
+    created_at timestamptz not null default now()
+);
+
+-- load_watchlist reads one key's watchlist events past its snapshot, in id order
+create index if not exists app_key_events_key_id_idx on app_key_events (key, id);
+
+-- Last event folded into app_keys.watchlist; null means nothing has been compacted yet
+alter table app_keys add column if not exists watchlist_event_id bigint;
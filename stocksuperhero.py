@@ -1,33 +1,50 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from supabase import create_client, Client
+from supabase import Client
 from datetime import datetime
 from functools import partial
 import plotly.graph_objects as go
 from st_aggrid import AgGrid
-from functions.agstyler import PINLEFT, PRECISION_TWO, draw_grid, highlight
-from functions.gauge import create_pie_chart
+from functions.agstyler import PINLEFT, PRECISION_TWO, draw_paged_grid, highlight
+from functions.gauge import create_gauge_grid
 from functions.area import plot_area_chart
 from functions.bar import plot_bar_chart
 from functions.metric import plot_metric
 from functions.tradingview import show_single_stock_widget, show_ticker_tape
 from functions.macd import plot_macd_chart
-import yfinance as yf
 import streamlit.components.v1 as components
 import time
-from functions.vector_search import get_supabase_dataframe
+import uuid
+from functions.db import get_client
+from functions.detail import load_dim_det_columns
+from functions.prefetch import get_prefetcher
+from functions.dim_cache import get_dim_cache
+from functions.filter_index import get_filter_index
+from functions.screener import get_screener, relative_value_weights
+from functions.peers import load_peer_history, plot_peer_chart
+from functions.schema import decode_trend_labels
+from functions.quotes import get_quote_service
+from functions.auth import client_id, get_authenticator
+from functions.tracing import finish_trace, profiling, render_profiler, start_trace
+from functions.fragments import page_fragment, publish
+from functions.persistence import record_login, record_watchlist_add, record_watchlist_remove
 
 # Set page configuration as the first Streamlit command
 st.set_page_config(layout="wide")
 
-# Supabase connection details
-url = st.secrets["supabase"]["url"]
-key = st.secrets["supabase"]["key"]
-supabase: Client = create_client(url, key)
-selected_stock_symbol = 'SBUX'
+# Collects every span of this rerun; add ?profile=1 to the URL to see the waterfall
+rerun_trace = start_trace()
 
-# Function to switch tables based on time period selection
+# Process-wide pooled Supabase client shared by every session
+supabase: Client = get_client()
+DEFAULT_SYMBOL = 'SBUX'
+PERIODS = ["Daily", "Weekly", "Monthly"]
+PEER_GROUPS = {"Sector": "sec", "Industry": "ind"}
+# Percentile-rank sliders of the relative value screen: widget key -> metric
+RANK_SLIDERS = {"ps_rank_slider": "ps", "pe_rank_slider": "pe", "dy_rank_slider": "dy"}
+
+# Function to map the time period selection to its period table (weekly/monthly are extended with the daily tail)
 def get_fact_table_for_period(period):
     if period == "Daily":
         return 'fact_daily'
@@ -36,44 +53,38 @@ def get_fact_table_for_period(period):
     else:
         return 'fact_monthly'
 
+def start_session(result):
+    st.session_state['authenticated'] = True
+    st.session_state['user_key'] = result.user_key
+    st.session_state['watchlist'] = result.watchlist
+    # Signed token in the URL lets a returning session skip the key lookup
+    st.query_params['session'] = result.token
+
 def login_user(user_key):
-    response = supabase.table('app_keys').select('watchlist').eq('key', user_key).execute()
-    print('login response')
-    print(response)
-    print(response.data)
-    if response.data:
+    # Cached, rate-limited key check; the database is only hit for unseen keys
+    result = get_authenticator().login(user_key, client_id())
+    if result.status == 'ok':
         st.toast('Your login was successful!', icon='🔓')
-        st.session_state['authenticated'] = True
-        current_timestamp = datetime.now().isoformat()
-        timestamps = response.data[0].get('login_timestamps', [])
-        timestamps.append(current_timestamp)
-        supabase.table('app_keys').update({'login_timestamps': timestamps}).eq('key', user_key).execute()
-        st.session_state['user_key'] = user_key
-        st.session_state['watchlist'] = response.data[0].get('watchlist', [])
+        # Append-only login event, flushed in the background with other writes
+        record_login(user_key)
+        start_session(result)
         st.rerun()  # Force rerun to apply login
+    elif result.status == 'rate_limited':
+        st.error("Too many attempts. Please wait a minute and try again.")
     else:
         st.error("Invalid access key.")
 
-# Function to filter dataframe
-def filter_dataframe(df, selected_pst, selected_ind, selected_sec):
-    if selected_pst:
-        df = df[df['pst'].isin(selected_pst)]
-    if selected_ind:
-        df = df[df['ind'].isin(selected_ind)]
-    if selected_sec:
-        df = df[df['sec'].isin(selected_sec)]
-    return df
+# Function to filter dataframe (bitmap intersection on the per-snapshot index)
+def filter_dataframe(filter_index, selected_pst, selected_ind, selected_sec):
+    return filter_index.filter(pst=selected_pst, ind=selected_ind, sec=selected_sec)
 
-def update_dropdowns(df, selected_sec):
-    available_sec = df['sec'].unique().tolist()
+def update_dropdowns(filter_index, selected_sec):
+    available_sec = filter_index.options('sec')
 
     # Update industries based on selected sectors
-    if selected_sec:
-        available_ind = df[df['sec'].isin(selected_sec)]['ind'].unique().tolist()
-    else:
-        available_ind = df['ind'].unique().tolist()
+    available_ind = filter_index.options('ind', sec=selected_sec)
 
-    available_pst = df['pst'].unique().tolist()
+    available_pst = filter_index.options('pst')
     return available_pst, available_ind, available_sec
 
 def on_pst_change(arg):
@@ -85,51 +96,93 @@ def on_pst_change(arg):
     else: 
         st.toast(f"Confirmed Other? {arg}")
 
-# Authentication check
-if 'authenticated' not in st.session_state:
-    st.session_state['authenticated'] = False
-
-if not st.session_state['authenticated']:
-    with st.expander("Login", expanded=True):
-        with st.form("access_form"):
-            user_key_input = st.text_input("Enter Access Key", type="password")
-            submit_button = st.form_submit_button("Verify Access Key Now")
-        if submit_button and user_key_input:
-            login_user(user_key_input)
-else:
-    user_key = st.session_state.get('user_key')
-    # Ensure the watchlist is loaded in session state
-    watchlist = st.session_state.get('watchlist', [])
-    
-    # Ensure 'df_dim' is loaded
-    if 'df_dim' not in st.session_state:
-        response_dim = supabase.table('dim').select('sym, cn, ind, sec, ps, pst, dy, dyt, pe, pet, ex').execute()
-        st.session_state['df_dim'] = pd.DataFrame(response_dim.data)
-    
-    df_dim = st.session_state['df_dim']
-
-    # Initialize session state for filters
-    if 'selected_sec' not in st.session_state:
-        st.session_state['selected_sec'] = []
-    if 'selected_ind' not in st.session_state:
-        st.session_state['selected_ind'] = []
-    if 'selected_pst' not in st.session_state:
-        st.session_state['selected_pst'] = []
+def on_filter_change(arg, widget_key, state_key):
+    # Toasts are shown by the filters fragment itself; callbacks of a keyed rerun must not draw
+    st.session_state['changed_filter'] = arg
+    publish(**{state_key: st.session_state[widget_key]})
+
+def clear_filters():
+    for widget_key in ("sector_multiselect", "industry_multiselect", "pst_multiselect"):
+        st.session_state[widget_key] = []
+    for widget_key in RANK_SLIDERS:
+        st.session_state[widget_key] = (0, 100)
+    publish(selected_sec=[], selected_ind=[], selected_pst=[], screen={})
+
+def on_screen_change():
+    # Only narrowed sliders become predicates; the full 0-100 range screens nothing
+    group = PEER_GROUPS[st.session_state['peer_group_select']]
+    ranges = {}
+    for widget_key, metric in RANK_SLIDERS.items():
+        low, high = st.session_state[widget_key]
+        if (low, high) != (0, 100):
+            ranges[f'{metric}_{group}_pct'] = (low / 100, high / 100)
+    publish(screen={'group': group, 'ranges': ranges} if ranges else {})
+
+def on_period_change():
+    publish(fact_table=get_fact_table_for_period(st.session_state['period_radio']))
+
+def current_filter_index():
+    # Shared, TTL-refreshed dim universe (read-only; never mutate in place)
+    dim_version, df_dim = get_dim_cache().snapshot()
+    return get_filter_index(dim_version, df_dim)
+
+def current_filtered_df():
+    # Bitmap intersection, cheap enough for every fragment that needs the filtered rows
+    dim_version, df_dim = get_dim_cache().snapshot()
+    filter_index = get_filter_index(dim_version, df_dim)
+    screen = st.session_state['screen']
+    if not screen:
+        return filter_dataframe(filter_index, st.session_state['selected_pst'], st.session_state['selected_ind'], st.session_state['selected_sec'])
+    # Relative value screen: rank predicates on top of the bitmap filters, best composite score first
+    # (index and screener come from the same snapshot, so their rows line up)
+    base = filter_index.mask(pst=st.session_state['selected_pst'], ind=st.session_state['selected_ind'], sec=st.session_state['selected_sec'])
+    return get_screener(dim_version, df_dim).screen(base=base, ranges=screen['ranges'], weights=relative_value_weights(screen['group']))
+
+def get_detail(symbol, fact_table):
+    # Shared bundle cache: fragment reruns and prefetched symbols never refetch
+    # (a miss fetches dim_det, daily facts and vector neighbours concurrently; weekly/monthly bars
+    # and MACD/RSI are derived locally, so switching the period never refetches)
+    return get_prefetcher().get(symbol, fact_table)
+
+def prefetch_details(symbols):
+    # Warm likely next selections in the background; a new selection cancels what is still queued
+    if 'prefetch_owner' not in st.session_state:
+        st.session_state['prefetch_owner'] = uuid.uuid4().hex
+    context = (st.session_state['selected_symbol'], st.session_state['fact_table'])
+    symbols = [sym for sym in symbols if sym != context[0]]
+    get_prefetcher().prefetch(st.session_state['prefetch_owner'], context, symbols, context[1])
+
+def get_text_labels(df_dim_det):
+    if not df_dim_det.empty:
+        # trend_json_ss is a heavy column: fetched on first use and cached per symbol
+        json_data = load_dim_det_columns(df_dim_det.loc[0, 'sym'], ['trend_json_ss'])['trend_json_ss']
+
+        # Convert the extracted JSON data into a dataframe (dt_st parsed once)
+        return decode_trend_labels(json_data)
+    return decode_trend_labels(None)
+
+# Each section is a fragment: its own widgets only rerun that section, and a changed
+# input (published from a callback) reruns just the sections that declared it.
+
+@page_fragment("filters", inputs=("selected_sec", "selected_ind", "selected_pst"))
+def filters_section():
+    filter_index = current_filter_index()
+    if 'changed_filter' in st.session_state:
+        on_pst_change(st.session_state.pop('changed_filter'))
 
     # Get updated dropdowns
-    available_pst, available_ind, available_sec = update_dropdowns(df_dim, st.session_state['selected_sec'])
+    available_pst, available_ind, available_sec = update_dropdowns(filter_index, st.session_state['selected_sec'])
 
     # Filter options inside an expander
     with st.expander("Filter Options", expanded=True):
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.session_state['selected_sec'] = st.multiselect(
+            st.multiselect(
                 "Select Sector", 
                 available_sec, 
-                #default=st.session_state['selected_sec'], 
                 key="sector_multiselect",
-                on_change=partial(on_pst_change, "sec")
+                on_change=partial(on_filter_change, "sec", "sector_multiselect", "selected_sec")
             )
             if st.session_state['selected_sec']:
                 st.success(f"Selected Sectors: {', '.join(st.session_state['selected_sec'])}")
@@ -137,14 +190,11 @@ else:
                 st.error("No Sector selected")
 
         with col2:
-            if st.session_state['selected_sec']:
-                available_ind = df_dim[df_dim['sec'].isin(st.session_state['selected_sec'])]['ind'].unique().tolist()
-            st.session_state['selected_ind'] = st.multiselect(
+            st.multiselect(
                 "Select Industry", 
                 available_ind, 
-                #default=st.session_state['selected_ind'], 
                 key="industry_multiselect",
-                on_change=partial(on_pst_change, "ind")
+                on_change=partial(on_filter_change, "ind", "industry_multiselect", "selected_ind")
             )
             if st.session_state['selected_ind']:
                 st.success(f"Selected Industries: {', '.join(st.session_state['selected_ind'])}")
@@ -152,305 +202,380 @@ else:
                 st.error("No Industry selected")
 
         with col3:
-            st.session_state['selected_pst'] = st.multiselect(
+            st.multiselect(
                 "Select PST Values", 
                 available_pst, 
-                #default=st.session_state.get('selected_pst', []),  # Ensure default is not None
                 key="pst_multiselect",
-                on_change=partial(on_pst_change, "ps")
+                on_change=partial(on_filter_change, "ps", "pst_multiselect", "selected_pst")
             )
             if st.session_state['selected_pst']:
                 st.success(f"Selected PST Values: {', '.join(st.session_state['selected_pst'])}")
             else:
                 st.error("No PST Values selected")
 
-        # Filter dataframe based on selections
-        filtered_df = filter_dataframe(df_dim, st.session_state['selected_pst'], st.session_state['selected_ind'], st.session_state['selected_sec'])
+        # Percentile ranks against sector or industry peers (precomputed per dim snapshot)
+        st.markdown("**Relative Value Screen** (percentile rank within peers)")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.selectbox("Peer Group", list(PEER_GROUPS), key="peer_group_select", on_change=on_screen_change)
+        for col, (widget_key, label) in zip((col2, col3, col4), zip(RANK_SLIDERS, ("P/S Rank", "P/E Rank", "Dividend Yield Rank"))):
+            with col:
+                st.slider(label, 0, 100, (0, 100), key=widget_key, on_change=on_screen_change)
 
         # Button to clear filters
-        if st.button("Clear All Filters"):
-            st.session_state['selected_sec'] = []
-            st.session_state['selected_ind'] = []
-            st.session_state['selected_pst'] = []
-            st.rerun()
+        st.button("Clear All Filters", on_click=clear_filters)
 
         # Add the radio button for time period selection
-        time_period = st.radio("Select Time Period", options=["Daily", "Weekly", "Monthly"], index=2)
-        fact_table = get_fact_table_for_period(time_period)  
-
-    if not filtered_df.empty:
-        #first df test
-        #st.dataframe(filtered_df)
-
-        #Main DF TEST
-        filtered_df['sym_cn'] = filtered_df['sym'] + " - " + filtered_df['cn']
-        df = filtered_df
-        values_with_colors = {
-            "Expensive": ("red", "black"),
-            "High": ("orange", "black"),
-            "Low": ("green", "black"),
-            "Cheap": ("lightgreen", "black")
+        st.radio("Select Time Period", options=PERIODS, key="period_radio", on_change=on_period_change)
+
+@page_fragment("screener", inputs=("selected_sec", "selected_ind", "selected_pst", "screen"))
+def screener_section():
+    filtered_df = current_filtered_df()
+    if filtered_df.empty:
+        st.warning("No data matches the selected filters.")
+        return
+
+    #Main DF TEST (sym_cn is precomputed by the dim cache)
+    df = filtered_df
+    values_with_colors = {
+        "Expensive": ("red", "black"),
+        "High": ("orange", "black"),
+        "Low": ("green", "black"),
+        "Cheap": ("lightgreen", "black")
+    }
+    highlight_function = highlight(values_with_colors)  
+    formatter = {
+        'sym': ('Symbol', PINLEFT),
+        'ind': ('Industry', {'width': 140}),
+        'ps': ('P/S', {**PRECISION_TWO, 'width': 80}),
+        'pst': ('PS Type', {
+            'cellStyle': highlight_function  # Apply the highlight function here
+            }),
+        'pe': ('P/E', {**PRECISION_TWO, 'width': 80}),
+        'pet': ('PE Type', {
+            'cellStyle': highlight_function  # Apply the highlight function here
+            }),
         }
-        highlight_function = highlight(values_with_colors)  
-        formatter = {
-            'sym': ('Symbol', PINLEFT),
-            'ind': ('Industry', {'width': 140}),
-            'ps': ('P/S', {**PRECISION_TWO, 'width': 80}),
-            'pst': ('PS Type', {
-                'cellStyle': highlight_function  # Apply the highlight function here
-                }),
-            'pe': ('P/E', {**PRECISION_TWO, 'width': 80}),
-            'pet': ('PE Type', {
-                'cellStyle': highlight_function  # Apply the highlight function here
-                }),
-            }
-
-        # Draw the grid with single selection and use checkbox as a boolean
-        data = draw_grid(
-            df.head(100),
-            formatter=formatter,
-            fit_columns=True,
-            selection='single',  # Use 'single' or 'multiple' as required
-            use_checkbox=True,  # Use checkbox as a boolean
-            max_height=300,
-        )
-
-        # Safely check if selected_rows exists and is not empty
-        selected_rows = getattr(data, 'selected_rows', None)
-
-        # Check if selected_rows is not None and is a list
-        if selected_rows is not None and isinstance(selected_rows, list) and len(selected_rows) > 0:
-            # Process selected rows
-            for selected_row in selected_rows:
-                if isinstance(selected_row, dict):
-                    selected_stock_symbol = selected_row.get('sym', 'N/A')
-
-        # This block is now outside the expander
-    if selected_stock_symbol:
-        # Fetch stock prices based on selected stock symbol
-        response_dim_det = supabase.table('dim_det').select('sym, pst, cn, ind, sec, ps, sps, psmin, ps2, ps5, ps8, psmax, psn, pst, pe, eps, pemin, pe2, pe5, pe8, pemax, pen, pet, dy, d, dymin, dy2, dy5, dy8, dymax, dyn, dyt, ex, trend_json_ss, v_ps, v_rsi, v_ps_string, v_rsi_string').eq('sym', selected_stock_symbol).execute()
-        response_fact = supabase.table(fact_table).select('sym, dt_st, p, high_tp, mid_tp, low_tp, ps, sps, pe, eps, dy, d').eq('sym', selected_stock_symbol).execute()
-        response_tech = supabase.table('stocksuperhero_tech_monthly').select('sym, dt_st, p, rsi, md, mds, mdh').eq('sym', selected_stock_symbol).execute()
-        if response_fact.data:
-            df_fact = pd.DataFrame(response_fact.data)
-            df_dim_det = pd.DataFrame(response_dim_det.data)
-            df_tech = pd.DataFrame(response_tech.data)
-
-            input_v_ps = df_dim_det['v_ps'][0] # Example embedding vector for v_ps
-            input_v_rsi = df_dim_det['v_rsi'][0]   # Example embedding vector for v_rsi
-            df_vector_search = get_supabase_dataframe(input_v_ps, input_v_rsi, match_count=100)
-            st.write("Vector Search Results")
-            st.dataframe(df_vector_search)
-
-            if not df_fact.empty:
-                # Extract the first row's 'trend_json_ss' data (if there's only one row per stock symbol)
-                json_data = df_dim_det.loc[0, 'trend_json_ss']
-
-                # Step 3: Convert the extracted JSON data into a dataframe
-                df_text_labels = pd.json_normalize(json_data)
-
-                # Step 4: Display the resulting df_text_labels
-                print(df_text_labels)
-
-                # MAIN APP AREA - FACT AND DIM
-                st.markdown("""
-                    <style>
-                    .col1 {
-                        max-width: 150px !important;
-                        padding: 0px !important;
-                        margin: 0px !important;
-                    }
-                    .col2 {
-                        padding: 0px !important;
-                        margin: 0px !important;
-                    }
-                    .col3 {
-                        padding: 0px !important;
-                        margin: 0px !important;
-                    }
-                    .rounded-image {
-                        border-radius: 15px;  /* Adjust the radius as needed */
-                    }
-                    </style>
-                    """, unsafe_allow_html=True)
-
-                col1, col2, col3 = st.columns([1, 3, 3], gap="small")  # Adjust ratio for the layout
-
-                with col1:
-                    # Display the company logo (left-aligned with a fixed width)
-                    image_url = f"https://ttok.s3.us-west-2.amazonaws.com/{selected_stock_symbol}.svg"
-                    st.markdown(f'<img src="{image_url}" width="120" class="rounded-image" alt="{selected_stock_symbol}">', unsafe_allow_html=True)
-
-                with col2:
-                    # Display the sector and industry (aligned with the company name and symbol)
-                    st.subheader(f"{df_dim_det['cn'].iloc[0]} - {selected_stock_symbol}")
-                    # Display the company name and symbol
-                    st.markdown(f"{df_dim_det['sec'].iloc[0]} - {df_dim_det['ind'].iloc[0]}")
-                    # Apply the custom class to col2 for styling
-                    st.markdown('<div class="col2"></div>', unsafe_allow_html=True)
-
-                with col3:
-                    # Real-time price widget
-                    if not filtered_df.empty and selected_stock_symbol in filtered_df['sym'].values:
-                        selected_exchange = filtered_df[filtered_df['sym'] == selected_stock_symbol]['ex'].values
-                        if len(selected_exchange) > 0:
-                            formatted_symbol = f"{selected_exchange[0]}:{selected_stock_symbol}"
-                            #print(formatted_symbol)
-                            show_single_stock_widget(formatted_symbol)
-                        else:
-                            st.warning("Exchange information is missing for the selected stock symbol.")
-                    else:
-                        st.warning(f"Stock symbol {selected_stock_symbol} not found in the filtered data.")        
-
-                plot_area_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type='p', metric_color='dodgerblue')
-
-                
-                plot_macd_chart(df_tech)
-                
-                # Bar Chart
-                fig_bar = plot_bar_chart(filtered_df, selected_stock_symbol)
-                if fig_bar:
-                    st.plotly_chart(fig_bar, use_container_width=True)
-                else:
-                    st.write("No data available to display in the bar chart.")
-
-                # Metric
-                df_text_labels['dt_st'] = pd.to_datetime(df_text_labels['dt_st']).dt.strftime("%b %y").astype(str)
-                plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='ps', metric_color='hotpink')
-                plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='pe', metric_color='orange')
-                plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='dy', metric_color='purple')
-
-                #GAUGES FROM DIM NOT FACT
-                st.markdown(
-                    """
-                    <style>
-                    /* Add your CSS styles here */
-                    .element-container {
-                        display: flex;
-                        justify-content: center;
-                        margin: 0px !important;
-                        padding: 0px !important;
-                    }
-                    </style>
-                    """, 
-                    unsafe_allow_html=True
-                )
-
-                # Layout for charts
-                col1, col2 = st.columns(2)
-
-                # First row of charts
-                with col1:
-                    st.write("<div style='text-align: center; margin-bottom: 0;'>", unsafe_allow_html=True)
-                    fig1 = create_pie_chart(df_dim_det, metric_type='ps', metric_color='hotpink')
-                    st.plotly_chart(fig1, use_container_width=False, config={'displayModeBar': False}, key="chart1")
-                    st.write("</div>", unsafe_allow_html=True)
-
-                with col2:
-                    st.write("<div style='text-align: center;'>", unsafe_allow_html=True)
-                    fig2 = create_pie_chart(df_dim_det, metric_type='pe', metric_color='hotpink')
-                    st.plotly_chart(fig2, use_container_width=False, config={'displayModeBar': False}, key="chart2")
-                    st.write("</div>", unsafe_allow_html=True)
-
-                # Second row of charts
-                col3, col4 = st.columns(2)
-
-                with col3:
-                    st.write("<div style='text-align: center;'>", unsafe_allow_html=True)
-                    fig3 = create_pie_chart(df_dim_det, metric_type='dy', metric_color='hotpink')
-                    st.plotly_chart(fig3, use_container_width=False, config={'displayModeBar': False}, key="chart3")
-                    st.write("</div>", unsafe_allow_html=True)
-
-                with col4:
-                    st.write("<div style='text-align: center;'>", unsafe_allow_html=True)
-                    fig4 = create_pie_chart(df_dim_det, metric_type='ps', metric_color='hotpink')
-                    st.plotly_chart(fig4, use_container_width=False, config={'displayModeBar': False}, key="chart4")
-                    st.write("</div>", unsafe_allow_html=True)
-
-                # Add Watchlist Functionality
-                watchlist = st.session_state.get('watchlist', [])
-                
-                # Check if the selected stock symbol is already in the watchlist
-                if any(item['symbol'] == selected_stock_symbol for item in watchlist):
-                    st.warning(f"{selected_stock_symbol} is already in your watchlist.")
-                elif len(watchlist) < 5:
-                    if st.button("Add to Watchlist"):
-                        # Fetch price from Yahoo Finance
-                        stock_data = yf.Ticker(selected_stock_symbol)
-                        price = stock_data.history(period='1d')['Close'].iloc[-1]
-                        timestamp = datetime.now().isoformat()
-    
-                        # Add the stock to the watchlist
-                        watchlist.append({
-                            'symbol': selected_stock_symbol,
-                            'timestamp': timestamp,
-                            'price': price
-                        })
+
+    # Draw the grid with single selection and use checkbox as a boolean
+    # Sorting, search and paging happen server-side; only the visible page is sent
+    data, page_df = draw_paged_grid(
+        df,
+        formatter=formatter,
+        page_size=100,
+        key="screener",
+        fit_columns=True,
+        selection='single',  # Use 'single' or 'multiple' as required
+        use_checkbox=True,  # Use checkbox as a boolean
+        max_height=300,
+        return_page=True,
+    )
+
+    # Safely check if selected_rows exists and is not empty
+    selected_rows = getattr(data, 'selected_rows', None)
+
+    # Check if selected_rows is not None and is a list
+    selected_stock_symbol = st.session_state['selected_symbol']
+    if selected_rows is not None and isinstance(selected_rows, list) and len(selected_rows) > 0:
+        # Process selected rows
+        for selected_row in selected_rows:
+            if isinstance(selected_row, dict):
+                selected_stock_symbol = selected_row.get('sym', 'N/A')
+
+    if selected_stock_symbol != st.session_state['selected_symbol']:
+        # Detail, watchlist and narrative all read the selection (grid selections have no callback)
+        st.session_state['selected_symbol'] = selected_stock_symbol
+        st.rerun()
+
+    # The next click is usually one of the top visible rows
+    prefetch_details(page_df['sym'].tolist())
+
+@page_fragment("detail", inputs=("selected_symbol", "fact_table", "selected_sec", "selected_ind", "selected_pst", "screen"))
+def detail_section():
+    filtered_df = current_filtered_df()
+    selected_stock_symbol = st.session_state['selected_symbol']
+    fact_table = st.session_state['fact_table']
+    if filtered_df.empty or not selected_stock_symbol:
+        return
+
+    bundle = get_detail(selected_stock_symbol, fact_table)
+    for source, error in bundle.errors.items():
+        st.warning(f"Could not load {source} for {selected_stock_symbol}: {error}")
+    if not bundle.ok(fact_table):
+        st.error(f"Failed to fetch data for {selected_stock_symbol}.")
+        return
+    df_fact = bundle.fact
+    df_dim_det = bundle.dim_det
+    df_tech = bundle.tech
+
+    df_vector_search = bundle.vectors
+    st.write("Vector Search Results")
+    st.dataframe(df_vector_search)
+    # ... or one of the nearest neighbours listed here
+    if 'sym' in df_vector_search.columns:
+        prefetch_details(df_vector_search['sym'].tolist())
+
+    if df_fact.empty:
+        st.warning(f"No stock price data found for {selected_stock_symbol}.")
+        return
+
+    # Peer comparison: selected symbol plus its nearest vector neighbours, loaded only while open
+    with st.expander("Peer Comparison", expanded=False, key="peer_expander", on_change="rerun") as peer_expander:
+        if peer_expander.open:
+            peer_symbols = [selected_stock_symbol] + df_vector_search['sym'].head(12).tolist()
+            df_peers = load_peer_history(tuple(peer_symbols), fact_table)
+            plot_peer_chart(df_peers, selected_stock_symbol)
+    df_text_labels = get_text_labels(df_dim_det)
+
+    # MAIN APP AREA - FACT AND DIM
+    st.markdown("""
+        <style>
+        .col1 {
+            max-width: 150px !important;
+            padding: 0px !important;
+            margin: 0px !important;
+        }
+        .col2 {
+            padding: 0px !important;
+            margin: 0px !important;
+        }
+        .col3 {
+            padding: 0px !important;
+            margin: 0px !important;
+        }
+        .rounded-image {
+            border-radius: 15px;  /* Adjust the radius as needed */
+        }
+        </style>
+        """, unsafe_allow_html=True)
+
+    col1, col2, col3 = st.columns([1, 3, 3], gap="small")  # Adjust ratio for the layout
+
+    with col1:
+        # Display the company logo (left-aligned with a fixed width)
+        image_url = f"https://ttok.s3.us-west-2.amazonaws.com/{selected_stock_symbol}.svg"
+        st.markdown(f'<img src="{image_url}" width="120" class="rounded-image" alt="{selected_stock_symbol}">', unsafe_allow_html=True)
+
+    with col2:
+        if not df_dim_det.empty:
+            # Display the sector and industry (aligned with the company name and symbol)
+            st.subheader(f"{df_dim_det['cn'].iloc[0]} - {selected_stock_symbol}")
+            # Display the company name and symbol
+            st.markdown(f"{df_dim_det['sec'].iloc[0]} - {df_dim_det['ind'].iloc[0]}")
+        else:
+            st.subheader(selected_stock_symbol)
+        # Apply the custom class to col2 for styling
+        st.markdown('<div class="col2"></div>', unsafe_allow_html=True)
+
+    with col3:
+        # Real-time price widget
+        if not filtered_df.empty and selected_stock_symbol in filtered_df['sym'].values:
+            selected_exchange = filtered_df[filtered_df['sym'] == selected_stock_symbol]['ex'].values
+            if len(selected_exchange) > 0:
+                formatted_symbol = f"{selected_exchange[0]}:{selected_stock_symbol}"
+                #print(formatted_symbol)
+                show_single_stock_widget(formatted_symbol)
+            else:
+                st.warning("Exchange information is missing for the selected stock symbol.")
+        else:
+            st.warning(f"Stock symbol {selected_stock_symbol} not found in the filtered data.")        
+
+    plot_area_chart(df_fact, selected_stock_symbol, df_text_labels, metric_type='p', metric_color='dodgerblue', period=fact_table)
+
     
-                        # Update watchlist in Supabase
-                        supabase.table('app_keys').update({'watchlist': watchlist}).eq('key', st.session_state['user_key']).execute()
-                        st.session_state['watchlist'] = watchlist
-                        st.success(f"{selected_stock_symbol} added to watchlist.")
-                else:
-                    st.warning("Watchlist is full. Please remove an existing stock to add a new one.")
-
-                # Ticker Tape
-                st.subheader("Watchlist Ticker Tape")
-                if watchlist:
-                    show_ticker_tape()
-                else:
-                    st.write("Your watchlist is empty.")
+    plot_macd_chart(df_tech, selected_stock_symbol, period=fact_table)
     
-                # Display Watchlist
-                st.subheader("Your Watchlist")
-                for idx, item in enumerate(watchlist):
-                    st.write(f"{item['symbol']} - Added on {item['timestamp']} at ${item['price']:.2f}")
-                    
-                    # Assign a unique key to each remove button using the stock symbol
-                    if st.button(f"Remove {item['symbol']} from Watchlist", key=f"remove_{item['symbol']}"):
-                        watchlist.remove(item)
-                        supabase.table('app_keys').update({'watchlist': watchlist}).eq('key', st.session_state['user_key']).execute()
-                        st.session_state['watchlist'] = watchlist
-                        st.rerun()  # Rerun to update the display
-
-                _LOREM_IPSUM = """
-                1. Stock Price Performance Analysis: Over the past year, Starbucks' stock has underperformed its peers with a -23.14% decline, classified as 'Poor', but has shown recent positive momentum with a 16.08% increase in the last month and a 5.58% rise over the preceding three months.
-                2. Sales Growth Forecast: Starbucks' historical average yearly sales growth per share is modestly above Domino's Pizza and McDonald's, but below Yum! Brands. The company's projected growth rates are 9.84% in 2024, 10.75% in 2025, and 13.34% in 2026, all above the industry average, indicating strong sales growth trajectory ahead.
-                3. Price-to-Sales Valuation Analysis: Despite Starbucks' price-to-sales ratio of 2.5x being above its historical average, it is undervalued relative to its sector's average of 5.04x, with McDonald's at 7.28x and Domino's Pizza at 3.51x.
-                4. Stock Target Price Expected Return Analysis (2025): Starbucks' projected target price returns for 2025 range from -1.4% to 66.0%, the highest among its peers, with a notable variability and a 91% probability of positive returns at the low-end projection.
-                5. Stock Price Trend & Momentum Analysis: Starbucks' stock price trend is negative as indicated by the MACD Line being below both the Zero and Signal Lines, with a weakening momentum as evidenced by the declining MACD Histogram. Conversely, 67% of the peer group, including Darden Restaurants, shows an improvement in momentum, while Starbucks' peers like Domino's Pizza, McDonald's, and Yum! Brands exhibit a downward trajectory with deteriorating momentum.
-                Key takeaways: Starbucks has underperformed historically but shows recent positive stock price trends. The company is expected to have strong sales growth in the coming years, which, combined with an undervalued valuation, presents a promising outlook for investors despite current negative momentum indicators.
-                """
-
-                _LOREM_IPSUM2 = """
-                1. Stock Price Performance Analysis: Over the past year, Starbucks' stock has underperformed its peers with a -23.14% decline, classified as 'Poor', but has shown recent positive momentum with a 16.08% increase in the last month and a 5.58% rise over the preceding three months.
-                2. Sales Growth Forecast: Starbucks' historical average yearly sales growth per share is modestly above Domino's Pizza and McDonald's, but below Yum! Brands. The company's projected growth rates are 9.84% in 2024, 10.75% in 2025, and 13.34% in 2026, all above the industry average, indicating strong sales growth trajectory ahead.
-                3. Price-to-Sales Valuation Analysis: Despite Starbucks' price-to-sales ratio of 2.5x being above its historical average, it is undervalued relative to its sector's average of 5.04x, with McDonald's at 7.28x and Domino's Pizza at 3.51x.
-                4. Stock Target Price Expected Return Analysis (2025): Starbucks' projected target price returns for 2025 range from -1.4% to 66.0%, the highest among its peers, with a notable variability and a 91% probability of positive returns at the low-end projection.
-                5. Stock Price Trend & Momentum Analysis: Starbucks' stock price trend is negative as indicated by the MACD Line being below both the Zero and Signal Lines, with a weakening momentum as evidenced by the declining MACD Histogram. Conversely, 67% of the peer group, including Darden Restaurants, shows an improvement in momentum, while Starbucks' peers like Domino's Pizza, McDonald's, and Yum! Brands exhibit a downward trajectory with deteriorating momentum.
-                Key takeaways: Starbucks has underperformed historically but shows recent positive stock price trends. The company is expected to have strong sales growth in the coming years, which, combined with an undervalued valuation, presents a promising outlook for investors despite current negative momentum indicators.
-                """
-
-                def stream_data():
-                    for word in _LOREM_IPSUM.split(" "):
-                        yield word + " "
-                        time.sleep(0.02)
-
-                    yield pd.DataFrame(filtered_df)
-                    
-                    yield plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='ps', metric_color='limegreen')
-
-                    for word in _LOREM_IPSUM2.split(" "):
-                        yield word + " "
-                        time.sleep(0.02)
-
-                if st.button("Stream data"):
-                    st.write_stream(stream_data)
+    # Bar Chart
+    fig_bar = plot_bar_chart(filtered_df, selected_stock_symbol)
+    if fig_bar:
+        st.plotly_chart(fig_bar, use_container_width=True)
+    else:
+        st.write("No data available to display in the bar chart.")
+
+    # Metric (month labels on the x axis, as the area chart shows them)
+    df_fact = df_fact.assign(dt_st=df_fact['dt_st'].dt.strftime("%b %y").astype(str))
+    df_text_labels['dt_st'] = df_text_labels['dt_st'].dt.strftime("%b %y").astype(str)
+    plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='ps', metric_color='hotpink', period=fact_table)
+    plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='pe', metric_color='orange', period=fact_table)
+    plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='dy', metric_color='purple', period=fact_table)
+
+    #GAUGES FROM DIM NOT FACT
+    st.markdown(
+        """
+        <style>
+        /* Add your CSS styles here */
+        .element-container {
+            display: flex;
+            justify-content: center;
+            margin: 0px !important;
+            padding: 0px !important;
+        }
+        </style>
+        """, 
+        unsafe_allow_html=True
+    )
+
+    if not df_dim_det.empty:
+        # All four gauges as one subplot figure (single chart payload)
+        st.write("<div style='text-align: center;'>", unsafe_allow_html=True)
+        fig_gauges = create_gauge_grid(df_dim_det, metrics=('ps', 'pe', 'dy', 'ps'))
+        st.plotly_chart(fig_gauges, use_container_width=False, config={'displayModeBar': False}, key="gauges")
+        st.write("</div>", unsafe_allow_html=True)
+
+
+@page_fragment("watchlist", inputs=("selected_symbol", "watchlist"))
+def watchlist_section():
+    selected_stock_symbol = st.session_state['selected_symbol']
+    if current_filtered_df().empty or not selected_stock_symbol:
+        return
+
+    # Add Watchlist Functionality
+    watchlist = st.session_state.get('watchlist', [])
 
+    # Warm quotes for the selected symbol and the watchlist in one background batch
+    quotes = get_quote_service()
+    quotes.prefetch([selected_stock_symbol] + [item['symbol'] for item in watchlist])
+    
+    # Check if the selected stock symbol is already in the watchlist
+    if any(item['symbol'] == selected_stock_symbol for item in watchlist):
+        st.warning(f"{selected_stock_symbol} is already in your watchlist.")
+    elif len(watchlist) < 5:
+        if st.button("Add to Watchlist"):
+            # Price from the quote service (usually already cached by the prefetch above)
+            price = quotes.get(selected_stock_symbol)
+            timestamp = datetime.now().isoformat()
+
+            if price is None:
+                st.error(f"No quote available for {selected_stock_symbol} right now. Please try again.")
             else:
-                st.warning(f"No stock price data found for {selected_stock_symbol}.")
-        else:
-            st.error(f"Failed to fetch data for {selected_stock_symbol}.")
+                # Add the stock to the watchlist
+                watchlist.append({
+                    'symbol': selected_stock_symbol,
+                    'timestamp': timestamp,
+                    'price': price
+                })
+
+                # Record the change as one event row instead of rewriting the whole list
+                record_watchlist_add(st.session_state['user_key'], watchlist[-1])
+                st.session_state['watchlist'] = watchlist
+                get_authenticator().remember_watchlist(st.session_state['user_key'], watchlist)
+                st.success(f"{selected_stock_symbol} added to watchlist.")
+    else:
+        st.warning("Watchlist is full. Please remove an existing stock to add a new one.")
+
+    # Ticker Tape
+    st.subheader("Watchlist Ticker Tape")
+    if watchlist:
+        show_ticker_tape()
+    else:
+        st.write("Your watchlist is empty.")
+
+    # Display Watchlist
+    st.subheader("Your Watchlist")
+    # Current valuation from cached quotes only, never blocks the rerun
+    current_prices = quotes.peek([item['symbol'] for item in watchlist])
+    for idx, item in enumerate(watchlist):
+        current = current_prices.get(item['symbol'])
+        change = f" · now ${current:.2f} ({(current / item['price'] - 1) * 100:+.2f}%)" if current and item['price'] else ""
+        st.write(f"{item['symbol']} - Added on {item['timestamp']} at ${item['price']:.2f}{change}")
+        
+        # Assign a unique key to each remove button using the stock symbol
+        if st.button(f"Remove {item['symbol']} from Watchlist", key=f"remove_{item['symbol']}"):
+            watchlist.remove(item)
+            record_watchlist_remove(st.session_state['user_key'], item['symbol'])
+            st.session_state['watchlist'] = watchlist
+            get_authenticator().remember_watchlist(st.session_state['user_key'], watchlist)
+            st.rerun(scope="fragment")  # Only the watchlist needs redrawing
+
+_LOREM_IPSUM = """
+1. Stock Price Performance Analysis: Over the past year, Starbucks' stock has underperformed its peers with a -23.14% decline, classified as 'Poor', but has shown recent positive momentum with a 16.08% increase in the last month and a 5.58% rise over the preceding three months.
+2. Sales Growth Forecast: Starbucks' historical average yearly sales growth per share is modestly above Domino's Pizza and McDonald's, but below Yum! Brands. The company's projected growth rates are 9.84% in 2024, 10.75% in 2025, and 13.34% in 2026, all above the industry average, indicating strong sales growth trajectory ahead.
+3. Price-to-Sales Valuation Analysis: Despite Starbucks' price-to-sales ratio of 2.5x being above its historical average, it is undervalued relative to its sector's average of 5.04x, with McDonald's at 7.28x and Domino's Pizza at 3.51x.
+4. Stock Target Price Expected Return Analysis (2025): Starbucks' projected target price returns for 2025 range from -1.4% to 66.0%, the highest among its peers, with a notable variability and a 91% probability of positive returns at the low-end projection.
+5. Stock Price Trend & Momentum Analysis: Starbucks' stock price trend is negative as indicated by the MACD Line being below both the Zero and Signal Lines, with a weakening momentum as evidenced by the declining MACD Histogram. Conversely, 67% of the peer group, including Darden Restaurants, shows an improvement in momentum, while Starbucks' peers like Domino's Pizza, McDonald's, and Yum! Brands exhibit a downward trajectory with deteriorating momentum.
+Key takeaways: Starbucks has underperformed historically but shows recent positive stock price trends. The company is expected to have strong sales growth in the coming years, which, combined with an undervalued valuation, presents a promising outlook for investors despite current negative momentum indicators.
+"""
+
+_LOREM_IPSUM2 = """
+1. Stock Price Performance Analysis: Over the past year, Starbucks' stock has underperformed its peers with a -23.14% decline, classified as 'Poor', but has shown recent positive momentum with a 16.08% increase in the last month and a 5.58% rise over the preceding three months.
+2. Sales Growth Forecast: Starbucks' historical average yearly sales growth per share is modestly above Domino's Pizza and McDonald's, but below Yum! Brands. The company's projected growth rates are 9.84% in 2024, 10.75% in 2025, and 13.34% in 2026, all above the industry average, indicating strong sales growth trajectory ahead.
+3. Price-to-Sales Valuation Analysis: Despite Starbucks' price-to-sales ratio of 2.5x being above its historical average, it is undervalued relative to its sector's average of 5.04x, with McDonald's at 7.28x and Domino's Pizza at 3.51x.
+4. Stock Target Price Expected Return Analysis (2025): Starbucks' projected target price returns for 2025 range from -1.4% to 66.0%, the highest among its peers, with a notable variability and a 91% probability of positive returns at the low-end projection.
+5. Stock Price Trend & Momentum Analysis: Starbucks' stock price trend is negative as indicated by the MACD Line being below both the Zero and Signal Lines, with a weakening momentum as evidenced by the declining MACD Histogram. Conversely, 67% of the peer group, including Darden Restaurants, shows an improvement in momentum, while Starbucks' peers like Domino's Pizza, McDonald's, and Yum! Brands exhibit a downward trajectory with deteriorating momentum.
+Key takeaways: Starbucks has underperformed historically but shows recent positive stock price trends. The company is expected to have strong sales growth in the coming years, which, combined with an undervalued valuation, presents a promising outlook for investors despite current negative momentum indicators.
+"""
+
+
+@page_fragment("narrative", inputs=("selected_symbol", "fact_table", "selected_sec", "selected_ind", "selected_pst", "screen"))
+def narrative_section():
+    filtered_df = current_filtered_df()
+    selected_stock_symbol = st.session_state['selected_symbol']
+    if filtered_df.empty or not selected_stock_symbol:
+        return
+    bundle = get_detail(selected_stock_symbol, st.session_state['fact_table'])
+    if not bundle.ok(bundle.fact_table) or bundle.fact.empty:
+        return
+    df_fact = bundle.fact.assign(dt_st=bundle.fact['dt_st'].dt.strftime("%b %y").astype(str))
+    df_text_labels = get_text_labels(bundle.dim_det)
+    df_text_labels['dt_st'] = df_text_labels['dt_st'].dt.strftime("%b %y").astype(str)
+
+    def stream_data():
+        for word in _LOREM_IPSUM.split(" "):
+            yield word + " "
+            time.sleep(0.02)
+
+        yield pd.DataFrame(filtered_df)
+        
+        yield plot_metric(df_fact, selected_stock_symbol, df_text_labels, metric_type='ps', metric_color='limegreen')
+
+        for word in _LOREM_IPSUM2.split(" "):
+            yield word + " "
+            time.sleep(0.02)
+
+    if st.button("Stream data"):
+        st.write_stream(stream_data)
+
+# Authentication check
+if 'authenticated' not in st.session_state:
+    st.session_state['authenticated'] = False
 
+if not st.session_state['authenticated'] and 'session' in st.query_params:
+    resumed = get_authenticator().resume(st.query_params['session'])
+    if resumed.status == 'ok':
+        start_session(resumed)
     else:
-        st.warning("No data matches the selected filters.")
\ No newline at end of file
+        del st.query_params['session']
+
+if not st.session_state['authenticated']:
+    with st.expander("Login", expanded=True):
+        with st.form("access_form"):
+            user_key_input = st.text_input("Enter Access Key", type="password")
+            submit_button = st.form_submit_button("Verify Access Key Now")
+        if submit_button and user_key_input:
+            login_user(user_key_input)
+else:
+    # Initialize session state for filters and the fragments' other shared inputs
+    if 'selected_sec' not in st.session_state:
+        st.session_state['selected_sec'] = []
+    if 'selected_ind' not in st.session_state:
+        st.session_state['selected_ind'] = []
+    if 'selected_pst' not in st.session_state:
+        st.session_state['selected_pst'] = []
+    if 'screen' not in st.session_state:
+        st.session_state['screen'] = {}
+    if 'period_radio' not in st.session_state:
+        st.session_state['period_radio'] = "Monthly"
+    if 'fact_table' not in st.session_state:
+        st.session_state['fact_table'] = get_fact_table_for_period(st.session_state['period_radio'])
+    if 'selected_symbol' not in st.session_state:
+        st.session_state['selected_symbol'] = DEFAULT_SYMBOL
+
+    filters_section()
+    screener_section()
+    detail_section()
+    watchlist_section()
+    narrative_section()
+
+finish_trace(rerun_trace)
+if profiling():
+    render_profiler(rerun_trace)